@@ -0,0 +1,148 @@
+"""Cache of the checker's results, keyed by what the policy means rather than how it is written.
+
+Users paste the same policies over and over, often re-indented, re-ordered or with comments
+changed. The key is a hash of the parsed YAML, in a canonical form that sorts mappings but
+keeps every value's type, plus the c7n version, so all of those hit the same entry. The YAML is loaded with c7n's DuplicateKeyCheckLoader, as
+validation loads it, so that YAML with duplicate keys is not merged with its de-duplicated
+twin. YAML that does not load that way is keyed on its exact text.
+
+Run output depends on the state of the moto backend too, so every key also carries a
+generation number. Whatever resets the moto fixtures should then invalidate the cache, e.g.
+by POSTing to ``/api/cache/invalidate`` with the ``INVALIDATE_TOKEN`` setting as a bearer token,
+which bumps the generation and orphans every entry.
+
+Entries live in an in-memory LRU with a TTL per process. Set ``CACHE_BACKEND`` in the
+``C7N_CHECKER`` settings to the alias of one of Django's caches to share them, and the
+generation, between processes instead.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from c7n_docs_checker.manifest import hash_text
+
+GENERATION_KEY = "c7n_checker:generation"
+
+DEFAULTS: dict[str, Any] = {
+    "CACHE_ENTRIES": 1024,
+    "CACHE_TTL": 3600.0,
+    "CACHE_BACKEND": None,
+    "INVALIDATE_TOKEN": None,
+}
+
+
+def canonical(value: Any) -> Any:
+    """The parsed YAML as JSON data that tells apart everything YAML does.
+
+    Mappings become sorted lists of key and value pairs, so keys of any type are kept as they
+    are, and values JSON has no type for, like dates, are tagged with their type.
+    """
+    if isinstance(value, dict):
+        pairs = [[canonical(key), canonical(item)] for key, item in value.items()]
+        return {"map": sorted(pairs, key=json.dumps)}
+    if isinstance(value, list):
+        return [canonical(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return {"type": type(value).__name__, "value": str(value)}
+
+
+def canonical_hash(yaml_content: str) -> str:
+    """A hash of the parsed policy and the c7n version, the same for equivalent YAML."""
+    import yaml
+    from c7n.commands import DuplicateKeyCheckLoader
+    from c7n.version import version
+
+    try:
+        data = yaml.load(yaml_content, Loader=DuplicateKeyCheckLoader)  # nosec, safe loader derived
+        key = json.dumps(canonical(data))
+    except Exception:
+        # Duplicate keys, syntax errors, or anything else that does not load
+        key = "unparsed:" + yaml_content
+    return hash_text(f"{version}\n{key}")
+
+
+class ResultCache:
+    """An LRU of results with a TTL, or a Django cache when given one.
+
+    Args:
+        max_entries (int): Most entries kept in memory.
+        ttl (float): Seconds an entry stays valid.
+        backend (Any): A Django cache to use instead of memory.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, backend: Any = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        if self.backend is not None:
+            return self.backend.get_or_set(GENERATION_KEY, 0, timeout=None)
+        return self._generation
+
+    def key(self, yaml_content: str) -> str:
+        """The policy's key in the current generation."""
+        return f"c7n_checker:{self.generation}:{canonical_hash(yaml_content)}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """The cached results, None if there are none or they expired."""
+        if self.backend is not None:
+            return self.backend.get(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.backend is not None:
+            self.backend.set(key, value, timeout=self.ttl)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> int:
+        """Orphans every entry, e.g. after the moto fixtures were reset. Returns the new generation."""
+        if self.backend is not None:
+            self.backend.add(GENERATION_KEY, 0, timeout=None)
+            return self.backend.incr(GENERATION_KEY)
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            return self._generation
+
+
+_CACHE: Optional[ResultCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    """Returns this process's result cache, creating it from the settings on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            from django.conf import settings
+
+            options = DEFAULTS | getattr(settings, "C7N_CHECKER", {})
+            backend = None
+            if options["CACHE_BACKEND"]:
+                from django.core.cache import caches
+
+                backend = caches[options["CACHE_BACKEND"]]
+            _CACHE = ResultCache(options["CACHE_ENTRIES"], options["CACHE_TTL"], backend)
+        return _CACHE
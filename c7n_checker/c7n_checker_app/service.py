@@ -0,0 +1,494 @@
+"""A resident, pre-warmed validation service for the checker's views.
+
+Running ``custodian validate`` and ``custodian run`` as subprocesses made every form submit
+pay for two c7n cold starts. The service keeps a small pool of worker processes that load
+c7n, its providers and the policy schema once, when they start, and then validate and run
+policies through the library. Requests wait for a free slot for a bounded time, and for
+their result for a bounded time, so a burst of users gets a quick "busy" answer instead of
+piling up behind each other.
+
+Settings, all optional, go in a ``C7N_CHECKER`` dict in the Django settings:
+
+* ``WORKERS``: worker processes, 0 runs everything on threads of the web server's process.
+* ``MAX_CONCURRENT_REQUESTS``: requests allowed to use the workers at once.
+* ``QUEUE_TIMEOUT``: seconds a request waits for a slot before it is turned away.
+* ``TIMEOUT``: seconds a request waits for its result.
+* ``ISOLATE_RUNS``: run each policy in a new moto account, see moto_account.
+
+Runs can also be streamed: the worker sends each line c7n logs back over a queue as it is
+logged, and stops the run at its next AWS API call once the request is cancelled, the
+client goes away or the timeout passes. Runs that are not streamed are stopped the same way
+when their request times out, so they give their worker and slot back.
+
+A pool whose worker died, or failed to start, is broken for good, so the service replaces it
+with a new one and tries once more. Requests are only turned away, as unavailable, when the
+new pool breaks too.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import secrets
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+from c7n_docs_checker.engine import get_engine, warm_worker
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The AWS profile the checker's runs have always used, which points at moto.
+WORKER_ENVIRONMENT: dict[str, Optional[str]] = {"AWS_PROFILE": "moto"}
+
+# Tells moto which account a request is for.
+MOTO_ACCOUNT_HEADER = "x-moto-account-id"
+
+# What c7n logs when a policy has found its resources.
+RESOURCE_COUNT = re.compile(r"policy:(?P<policy>\S+) resource:(?P<resource>\S+) "
+                            r"region:(?P<region>\S*) count:(?P<count>\d+)")
+
+# How often a stream checks on its run while the run is quiet.
+POLL_SECONDS = 0.5
+
+DEFAULTS: dict[str, Any] = {
+    "WORKERS": min(4, os.cpu_count() or 1),
+    "MAX_CONCURRENT_REQUESTS": 16,
+    "QUEUE_TIMEOUT": 5.0,
+    "TIMEOUT": 60.0,
+    "ISOLATE_RUNS": True,
+}
+
+
+class ServiceBusy(Exception):
+    """Every slot was taken for longer than the queue timeout."""
+
+
+class ServiceUnavailable(ServiceBusy):
+    """The workers broke, and broke again once replaced, e.g. because they cannot start."""
+
+
+class ServiceTimeout(Exception):
+    """The result did not arrive within the request timeout."""
+
+
+class RunCancelled(Exception):
+    """Raised in place of an AWS API call once a streamed run was cancelled."""
+
+
+def validate_policy(yaml_content: str) -> tuple[bool, str]:
+    """Validates a policy file's content like ``custodian validate`` does. Runs in a worker.
+
+    Args:
+        yaml_content (str): The policy file's content.
+
+    Returns:
+        tuple[bool, str]: Whether it is valid, and the errors followed by the verdict.
+    """
+    errors = get_engine().validate_text(yaml_content)
+    if errors:
+        return False, "\n".join([*errors, "Configuration invalid"])
+    return True, "Configuration valid"
+
+
+def new_account_id() -> str:
+    """A random, 12 digit, fake AWS account id."""
+    return f"{secrets.randbelow(10 ** 12):012d}"
+
+
+_MOTO_ACCOUNT: Optional[str] = None
+
+
+def _add_account_header(request: Any, **kwargs: Any) -> None:
+    if _MOTO_ACCOUNT is not None:
+        request.headers[MOTO_ACCOUNT_HEADER] = _MOTO_ACCOUNT
+
+
+@contextlib.contextmanager
+def moto_account(account_id: str) -> Iterator[None]:
+    """Sends the AWS API calls made in this process during the block to their own account on
+    the moto server, so that runs do not see or change each other's resources.
+
+    The account is per process, not per thread, since c7n makes some calls from its own
+    threads. Only process workers, which run one policy at a time, are isolated this way.
+    """
+    from botocore.session import Session
+
+    global _MOTO_ACCOUNT
+    original = Session.create_client
+    # Patched once per process. c7n reuses clients between runs, so the header is looked up
+    # when each request is signed rather than when the client is created.
+    if not getattr(original, "moto_account", False):
+        def create_client(session: Session, *args: Any, **kwargs: Any) -> Any:
+            client = original(session, *args, **kwargs)
+            client.meta.events.register("before-sign", _add_account_header)
+            return client
+
+        create_client.moto_account = True  # type: ignore[attr-defined]
+        Session.create_client = create_client
+    _MOTO_ACCOUNT = account_id
+    try:
+        yield
+    finally:
+        _MOTO_ACCOUNT = None
+
+
+def run_policy(yaml_content: str, isolate: bool = True) -> tuple[bool, str]:
+    """Runs a policy file's content like ``custodian run --verbose`` does. Runs in a worker.
+
+    Everything custodian writes goes to a temporary directory that is removed afterwards.
+
+    Args:
+        yaml_content (str): The policy file's content.
+        isolate (bool): Run in a new moto account of its own, see moto_account.
+
+    Returns:
+        tuple[bool, str]: Whether the run succeeded, and everything it logged.
+    """
+    with tempfile.TemporaryDirectory(prefix="c7n_checker_") as folder:
+        policy_file = Path(folder) / "policy.yaml"
+        policy_file.write_text(yaml_content, encoding="utf-8")
+        with moto_account(new_account_id()) if isolate else contextlib.nullcontext():
+            # c7n's resource cache is shared by every run in the process, whatever the account.
+            return get_engine().run_file(policy_file, str(Path(folder) / "output"), ["--cache-period=0"])
+
+
+class _QueueLogHandler(logging.Handler):
+    """Sends the formatted lines logged on one thread to a queue."""
+
+    def __init__(self, messages: Any) -> None:
+        super().__init__()
+        self.messages = messages
+        thread = threading.get_ident()
+        self.addFilter(lambda record: record.thread == thread)
+        self.setFormatter(logging.Formatter("%(name)s:%(levelname)s %(message)s"))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.put(self.format(record))
+
+
+_CANCEL = threading.local()
+
+
+@contextlib.contextmanager
+def cancellable(cancel: Any) -> Iterator[None]:
+    """Makes the AWS API calls this thread makes in the block raise RunCancelled once cancel is set."""
+    from botocore.client import BaseClient
+
+    original = BaseClient._make_api_call
+    # Patched once per process; threads each have their own event.
+    if not getattr(original, "cancellable", False):
+        def make_api_call(client: BaseClient, operation_name: str, api_params: dict[str, Any]) -> Any:
+            event = getattr(_CANCEL, "event", None)
+            if event is not None and event.is_set():
+                raise RunCancelled(f"Cancelled before {operation_name}")
+            return original(client, operation_name, api_params)
+
+        make_api_call.cancellable = True  # type: ignore[attr-defined]
+        BaseClient._make_api_call = make_api_call
+    _CANCEL.event = cancel
+    try:
+        yield
+    finally:
+        _CANCEL.event = None
+
+
+def cancellable_policy(yaml_content: str, cancel: Any, isolate: bool = True) -> tuple[bool, str]:
+    """Runs a policy like run_policy, stopping at its next AWS API call once cancel is set. Runs in a worker.
+
+    Args:
+        yaml_content (str): The policy file's content.
+        cancel (Any): An event shared with the web server, set when the request times out.
+        isolate (bool): Run in a new moto account of its own, see moto_account.
+
+    Returns:
+        tuple[bool, str]: Whether the run succeeded, and everything it logged.
+    """
+    with cancellable(cancel):
+        return run_policy(yaml_content, isolate)
+
+
+def stream_policy(yaml_content: str, messages: Any, cancel: Any, isolate: bool = True) -> tuple[bool, str]:
+    """Runs a policy like run_policy, putting each line it logs on messages and then None.
+
+    Args:
+        yaml_content (str): The policy file's content.
+        messages (Any): A queue shared with the web server.
+        cancel (Any): An event shared with the web server, which stops the run when set.
+        isolate (bool): Run in a new moto account of its own, see moto_account.
+
+    Returns:
+        tuple[bool, str]: Whether the run succeeded, and everything it logged.
+    """
+    handler = _QueueLogHandler(messages)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        return cancellable_policy(yaml_content, cancel, isolate)
+    finally:
+        root.removeHandler(handler)
+        messages.put(None)
+
+
+def _noop() -> None:
+    pass
+
+
+def _unavailable(error: concurrent.futures.BrokenExecutor) -> ServiceUnavailable:
+    return ServiceUnavailable(f"The validation workers are not working ({error}), try again later")
+
+
+class ValidationService:
+    """A pool of pre-warmed workers, with a limit on concurrent requests and timeouts.
+
+    Args:
+        workers (int): Worker processes, 0 to use threads of this process instead.
+        max_concurrent_requests (int): Requests allowed to use the workers at once.
+        queue_timeout (float): Seconds to wait for a slot before raising ServiceBusy.
+        timeout (float): Seconds to wait for a result before raising ServiceTimeout.
+        environment (Optional[dict[str, Optional[str]]]): Environment variables for the workers, see
+            warm_worker. With in-process workers they are set on this process.
+        isolate (bool): Run each policy in a new moto account, see moto_account.
+    """
+
+    def __init__(self, workers: int, max_concurrent_requests: int, queue_timeout: float, timeout: float,
+                 environment: Optional[dict[str, Optional[str]]] = None, isolate: bool = True) -> None:
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.isolate = isolate
+        self._slots = threading.BoundedSemaphore(max_concurrent_requests)
+        self._manager: Any = None
+        self._manager_lock = threading.Lock()
+        self._max_concurrent_requests = max_concurrent_requests
+        self._environment = WORKER_ENVIRONMENT if environment is None else environment
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> concurrent.futures.Executor:
+        if self.workers:
+            # Forking a threaded web server can copy held locks into the children.
+            return concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_worker, initargs=(self._environment,))
+        # Shares this process's engine and moto account; concurrent runs are not isolated.
+        return concurrent.futures.ThreadPoolExecutor(
+            self._max_concurrent_requests, initializer=warm_worker, initargs=(self._environment,))
+
+    def _replace(self, broken: concurrent.futures.Executor) -> None:
+        """Swaps a broken executor for a new one, unless another request already has."""
+        with self._executor_lock:
+            if self._executor is broken:
+                LOGGER.warning("The validation workers broke, starting new ones")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+
+    def _submit(self, func: Callable[..., T], *args: Any) -> concurrent.futures.Future:
+        executor = self._executor
+        try:
+            return executor.submit(func, *args)
+        except concurrent.futures.BrokenExecutor:
+            # An executor only says it is broken when work is given to it.
+            self._replace(executor)
+        try:
+            return self._executor.submit(func, *args)
+        except concurrent.futures.BrokenExecutor as e:
+            raise _unavailable(e) from e
+
+    def submit(self, func: Callable[..., T], *args: Any) -> concurrent.futures.Future:
+        """Starts func on a worker once a slot is free.
+
+        The slot is given back when func finishes, not when the caller stops waiting, so work
+        that outlives its request still counts against the limit.
+
+        Raises:
+            ServiceBusy: No slot came free within the queue timeout.
+            ServiceUnavailable: The workers are broken, and so are their replacements.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ServiceBusy(f"All {self.workers or 'in-process'} workers are busy, try again shortly")
+        try:
+            future = self._submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, func: Callable[..., T], *args: Any, cancel: Any = None) -> T:
+        """Runs func on a worker and waits for its result.
+
+        Args:
+            cancel (Any): An event func was given, set if the result does not arrive in time, so
+                that func stops and gives its slot back rather than running on.
+
+        Raises:
+            ServiceBusy: No slot came free within the queue timeout.
+            ServiceUnavailable: The workers broke, and broke again when replaced.
+            ServiceTimeout: The result did not arrive within the timeout.
+        """
+        for retry in (True, False):
+            future = self.submit(func, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except concurrent.futures.TimeoutError:
+                raise ServiceTimeout(f"No result within {self.timeout:g}s") from None
+            except concurrent.futures.BrokenExecutor as e:
+                # The next submit replaces the broken pool.
+                if not retry:
+                    raise _unavailable(e) from e
+            finally:
+                # Cancelling the future only helps if it has not started yet.
+                if not future.done() and not future.cancel() and cancel is not None:
+                    cancel.set()
+        raise AssertionError("unreachable")
+
+    async def acall(self, func: Callable[..., T], *args: Any, cancel: Any = None) -> T:
+        """Like call, but waits without blocking the event loop.
+
+        The run is also cancelled when the client goes away.
+
+        Raises:
+            ServiceBusy: No slot came free within the queue timeout.
+            ServiceUnavailable: The workers broke, and broke again when replaced.
+            ServiceTimeout: The result did not arrive within the timeout.
+        """
+        for retry in (True, False):
+            future = await asyncio.to_thread(self.submit, func, *args)
+            try:
+                # Cancelling the wrapper, on timeout or when the client goes away, cancels the future.
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                raise ServiceTimeout(f"No result within {self.timeout:g}s") from None
+            except concurrent.futures.BrokenExecutor as e:
+                if not retry:
+                    raise _unavailable(e) from e
+            finally:
+                if not future.done() and cancel is not None:
+                    cancel.set()
+        raise AssertionError("unreachable")
+
+    def _shared(self) -> Any:
+        """Where objects shared with process workers are made, None with in-process workers."""
+        if not self.workers:
+            return None
+        with self._manager_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def event(self) -> Any:
+        """An event that this process and a worker can share."""
+        manager = self._shared()
+        return threading.Event() if manager is None else manager.Event()
+
+    def channel(self) -> tuple[Any, Any]:
+        """A queue and an event that this process and a worker can share."""
+        manager = self._shared()
+        if manager is None:
+            return queue.Queue(), threading.Event()
+        return manager.Queue(), manager.Event()
+
+    async def stream_run(self, yaml_content: str) -> AsyncIterator[tuple[str, Any]]:
+        """Runs the policy on a worker, yielding what happens as it happens.
+
+        Yields ``("log", line)`` for every line the run logs, ``("resources", counts)`` when a
+        policy has found its resources, and ``("done", {"ok": ok})`` at the end. Closing the
+        iterator early cancels the run.
+
+        Raises:
+            ServiceBusy: No slot came free within the queue timeout.
+            ServiceUnavailable: The workers broke. The run is not retried, its log has been sent.
+            ServiceTimeout: The run did not finish within the timeout, and was cancelled.
+        """
+        messages, cancel = await asyncio.to_thread(self.channel)
+        future = await asyncio.to_thread(self.submit, stream_policy, yaml_content, messages, cancel,
+                                        self.isolate)
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                # Checked on every line too, so a run that keeps logging still times out.
+                if time.monotonic() > deadline:
+                    cancel.set()
+                    raise ServiceTimeout(f"Cancelled after {self.timeout:g}s")
+                try:
+                    line = await asyncio.to_thread(messages.get, True, POLL_SECONDS)
+                except queue.Empty:
+                    if future.done():
+                        break
+                    continue
+                if line is None:
+                    break
+                yield "log", line
+                match = RESOURCE_COUNT.search(line)
+                if match:
+                    yield "resources", match.groupdict() | {"count": int(match["count"])}
+            try:
+                ok, _ = await asyncio.wrap_future(future)
+            except concurrent.futures.BrokenExecutor as e:
+                raise _unavailable(e) from e
+            yield "done", {"ok": ok}
+        finally:
+            # Stops the run if it is still going, because it timed out or the client went away.
+            cancel.set()
+
+    def validate(self, yaml_content: str) -> tuple[bool, str]:
+        return self.call(validate_policy, yaml_content)
+
+    def run(self, yaml_content: str) -> tuple[bool, str]:
+        cancel = self.event()
+        return self.call(cancellable_policy, yaml_content, cancel, self.isolate, cancel=cancel)
+
+    async def arun(self, yaml_content: str) -> tuple[bool, str]:
+        cancel = await asyncio.to_thread(self.event)
+        return await self.acall(cancellable_policy, yaml_content, cancel, self.isolate, cancel=cancel)
+
+    def warm(self) -> bool:
+        """Starts the workers now, rather than on the first request.
+
+        Workers that fail to start are logged rather than raised, so the app still comes up;
+        requests then start new workers, or answer that the service is unavailable.
+
+        Returns:
+            bool: Whether the workers started.
+        """
+        try:
+            for future in [self._submit(_noop) for _ in range(self.workers or 1)]:
+                future.result()
+        except (concurrent.futures.BrokenExecutor, ServiceUnavailable):
+            LOGGER.exception("The validation workers failed to start, e.g. the %r AWS profile is missing",
+                             self._environment.get("AWS_PROFILE"))
+            return False
+        return True
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+
+_SERVICE: Optional[ValidationService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_service() -> ValidationService:
+    """Returns this process's service, creating it from the settings on first use."""
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            from django.conf import settings
+
+            options = DEFAULTS | getattr(settings, "C7N_CHECKER", {})
+            _SERVICE = ValidationService(
+                options["WORKERS"], options["MAX_CONCURRENT_REQUESTS"], options["QUEUE_TIMEOUT"], options["TIMEOUT"],
+                isolate=options["ISOLATE_RUNS"])
+            atexit.register(_SERVICE.shutdown)
+        return _SERVICE
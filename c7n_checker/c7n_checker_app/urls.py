@@ -16,9 +16,13 @@ Including another URLconf
 """
 from django.urls import path
 
-from c7n_checker.c7n_checker_app.views import ValidateYamlView
+from c7n_checker.c7n_checker_app.views import (DryRunStreamView, InvalidateCacheView, ValidateApiView,
+                                               ValidateYamlView)
 
 urlpatterns = [
     path('', ValidateYamlView.as_view(), name='validate_yaml'),
     path('validate/', ValidateYamlView.as_view(), name='validate_yaml'),
+    path('api/validate', ValidateApiView.as_view(), name='api_validate'),
+    path('api/dry-run', DryRunStreamView.as_view(), name='api_dry_run'),
+    path('api/cache/invalidate', InvalidateCacheView.as_view(), name='api_cache_invalidate'),
 ]
@@ -1,83 +1,242 @@
-import os
-import subprocess
-import tempfile
-from typing import Optional
+import asyncio
+import hmac
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Optional
 
-from django.http import HttpRequest, HttpResponse
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
 
+from c7n_checker.c7n_checker_app import cache
+from c7n_checker.c7n_checker_app.cache import get_cache
 from c7n_checker.c7n_checker_app.forms import YamlForm
+from c7n_checker.c7n_checker_app.service import ServiceBusy, ServiceTimeout, get_service, validate_policy
+
+LOGGER = logging.getLogger(__name__)
+
+STAGES = ("yaml", "validate", "dry_run")
+
+
+def check_yaml(yaml_content: str) -> str:
+    """
+    Validate yaml as yaml. Don't check schema
+    """
+    import yaml
+    from c7n_make.yaml_loading import safe_load_all
+    try:
+        # Custodian loads policies with a safe loader, so tags it would reject are complaints here too.
+        for _ in safe_load_all(yaml_content):
+            pass
+    except yaml.YAMLError as exc:
+        complaint = str(exc)
+        return complaint
+    # Blank means fine
+    return ""
+
+
+async def run_stage(stage: str, yaml_content: str) -> tuple[str, dict[str, Any]]:
+    """Runs one stage of the check, the YAML parse here and the others on the service's workers.
+
+    Returns:
+        tuple[str, dict[str, Any]]: The stage, and whether it passed, its output and how long it took.
+
+    Raises:
+        ServiceBusy: The service had no free slot.
+    """
+    start = time.perf_counter()
+    try:
+        if stage == "yaml":
+            output = await asyncio.to_thread(check_yaml, yaml_content)
+            ok = not output
+        elif stage == "validate":
+            ok, output = await get_service().acall(validate_policy, yaml_content)
+        else:
+            ok, output = await get_service().arun(yaml_content)
+        timed_out = False
+    except ServiceTimeout as e:
+        ok, output, timed_out = False, f"Gave up waiting: {e}", True
+    return stage, {"ok": ok, "output": output, "seconds": round(time.perf_counter() - start, 3),
+                   "timed_out": timed_out, "cached": False}
+
+
+async def iter_stages(yaml_content: str) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """Runs the stages concurrently, yielding each one's result as soon as it finishes.
+
+    Results for a policy that was checked before come from the cache instead, all at once.
+
+    Raises:
+        ServiceBusy: The service had no free slot; the other stages are cancelled.
+    """
+    cache = get_cache()
+    key = await asyncio.to_thread(cache.key, yaml_content)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        for stage in STAGES:
+            yield stage, cached[stage] | {"cached": True}
+        return
+
+    results = {}
+    tasks = [asyncio.ensure_future(run_stage(stage, yaml_content)) for stage in STAGES]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            stage, result = await finished
+            results[stage] = result
+            yield stage, result
+    finally:
+        for task in tasks:
+            task.cancel()
+    if len(results) == len(STAGES) and cacheable(results):
+        await asyncio.to_thread(cache.put, key, results)
+
+
+def cacheable(results: dict[str, dict[str, Any]]) -> bool:
+    """Whether the results are down to the policy alone, and can be served again.
+
+    A dry run of a valid policy that failed may have failed because moto was down, so only
+    successful runs, or runs of policies that did not validate, are cached.
+    """
+    if any(result["timed_out"] for result in results.values()):
+        return False
+    return results["dry_run"]["ok"] or not results["validate"]["ok"]
 
 
 class ValidateYamlView(View):
     template_name = "checker.jinja2"
 
-    def get(self, request: HttpRequest) -> HttpResponse:
+    async def get(self, request: HttpRequest) -> HttpResponse:
         form = YamlForm()
         return render(request, self.template_name, {"form": form})
 
-    def post(self, request: HttpRequest) -> HttpResponse:
+    async def post(self, request: HttpRequest) -> HttpResponse:
         form = YamlForm(request.POST)
 
-        yaml_validation: Optional[str] = None
-        validation_output: Optional[str] = None
-        dry_run_output: Optional[str] = None
-
+        results: dict[str, dict[str, Any]] = {}
+        busy: Optional[str] = None
 
         if form.is_valid():
-            yaml_content = form.cleaned_data["yaml_content"]
-            yaml_validation = self.run_yaml_validate(yaml_content)
-            validation_output = self.run_custodian_command(yaml_content, validate=True)
-            dry_run_output = self.run_custodian_command(yaml_content, validate=False)
+            try:
+                results = {stage: result async for stage, result in iter_stages(form.cleaned_data["yaml_content"])}
+            except ServiceBusy as e:
+                busy = str(e)
 
         return render(
             request,
             self.template_name,
             {
                 "form": form,
-                "validation_output": validation_output,
-                "dry_run_output": dry_run_output,
-                "yaml_validation_output": yaml_validation,
+                "validation_output": busy or results.get("validate", {}).get("output"),
+                "dry_run_output": results.get("dry_run", {}).get("output"),
+                "yaml_validation_output": results.get("yaml", {}).get("output"),
             },
+            status=503 if busy else 200,
         )
 
-    def run_yaml_validate(self, yaml_content: str) -> str:
-        """
-        Validate yaml as yaml. Don't check schema
-        """
-        import yaml
+
+class ValidateApiView(View):
+    """JSON API for editors and scripts.
+
+    POST a JSON object with ``yaml_content``, or the YAML itself, and get back an object with
+    ``ok``, ``output``, ``seconds``, ``timed_out`` and ``cached`` for each of the ``yaml``,
+    ``validate`` and ``dry_run`` stages. With ``?stream=1`` the stages come back as newline delimited JSON, each one as soon
+    as it finishes. A dry run executes the policy, so requests need the ``csrftoken`` cookie
+    and its value in an ``X-CSRFToken`` header, like any other POST to Django.
+    """
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        if request.content_type == "application/json":
+            try:
+                yaml_content = json.loads(request.body)["yaml_content"]
+            except (ValueError, TypeError, KeyError):
+                return JsonResponse({"error": "Expected a JSON object with yaml_content"}, status=400)
+        else:
+            yaml_content = request.body.decode(request.encoding or "utf-8")
+        if not isinstance(yaml_content, str) or not yaml_content.strip():
+            return JsonResponse({"error": "No YAML to check"}, status=400)
+
+        if request.GET.get("stream"):
+            return StreamingHttpResponse(self.stream(yaml_content), content_type="application/x-ndjson")
         try:
-            yaml.load(yaml_content, Loader=yaml.FullLoader)
-        except yaml.YAMLError as exc:
-            complaint = str(exc)
-            return complaint
-        # Blank means fine
-        return ""
-
-    def run_custodian_command(self, yaml_content: str, validate: bool) -> str:
-        # Create a temporary file to store the YAML content
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.yaml') as temp_file:
-            temp_file.write(yaml_content)
-            temp_file_path = temp_file.name
-
-        # Construct the command using the temporary file path
-        if validate:
-            command = ["custodian", "validate", "--verbose", temp_file_path]
+            results = {stage: result async for stage, result in iter_stages(yaml_content)}
+        except ServiceBusy as e:
+            return JsonResponse({"error": str(e)}, status=503)
+        return JsonResponse({stage: results[stage] for stage in STAGES})
+
+    async def stream(self, yaml_content: str) -> AsyncIterator[str]:
+        try:
+            async for stage, result in iter_stages(yaml_content):
+                yield json.dumps({"stage": stage, **result}) + "\n"
+        except ServiceBusy as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        except Exception as e:
+            # Headers are long gone, so a failed worker has to end the stream with a line instead.
+            LOGGER.exception("Streamed check failed")
+            yield json.dumps({"error": f"The check failed: {type(e).__name__}"}) + "\n"
+
+
+class DryRunStreamView(View):
+    """Streams a run of the posted YAML as server-sent events, as it happens.
+
+    Events are ``log`` for each line the run logs, ``resources`` with the policy, resource,
+    region and count once a policy has found its resources, then ``done`` with whether the
+    run succeeded, or ``error``. Every event's data is JSON. The run is cancelled when the
+    client disconnects. Lines only arrive as they happen when served over ASGI.
+    """
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        if request.content_type in ("multipart/form-data", "application/x-www-form-urlencoded"):
+            # Django has already read the body of a form, it cannot be read again.
+            yaml_content = request.POST.get("yaml_content", "")
         else:
-            command = ["custodian", "run", "-s", "logs", "--verbose", temp_file_path]
+            yaml_content = request.body.decode(request.encoding or "utf-8")
+        if not yaml_content.strip():
+            return JsonResponse({"error": "No YAML to run"}, status=400)
+        response = StreamingHttpResponse(self.events(yaml_content), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Stops nginx from buffering the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
 
+    async def events(self, yaml_content: str) -> AsyncIterator[str]:
         try:
-            process = subprocess.run(
-                command,
-                text=True,
-                capture_output=True,
-                check=True,
-                env=dict(os.environ) | {"AWS_PROFILE": "moto"}
-            )
-            return process.stdout + process.stderr
-        except subprocess.CalledProcessError as e:
-            return e.stdout + e.stderr
-        finally:
-            # Delete the temporary file after the command has been executed
-            os.remove(temp_file_path)
+            async for event, data in get_service().stream_run(yaml_content):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except (ServiceBusy, ServiceTimeout) as e:
+            yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+        except Exception as e:
+            # A dead worker or manager must still end the stream with an event the client sees.
+            LOGGER.exception("Streamed run failed")
+            yield f"event: error\ndata: {json.dumps(f'The run failed: {type(e).__name__}')}\n\n"
+
+
+def _has_invalidate_token(request: HttpRequest) -> bool:
+    """Whether the request carries ``Authorization: Bearer <INVALIDATE_TOKEN>``."""
+    token = (cache.DEFAULTS | getattr(settings, "C7N_CHECKER", {}))["INVALIDATE_TOKEN"]
+    scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(given.encode(), token.encode())
+
+
+# Exempt so that scripts can call it with the token alone; the staff path checks CSRF itself.
+@method_decorator(csrf_exempt, name="dispatch")
+class InvalidateCacheView(View):
+    """Forgets every cached result. Call it whenever the moto fixtures are reset.
+
+    Only staff users, or scripts sending the ``INVALIDATE_TOKEN`` setting as a bearer token, may
+    call it.
+    """
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        if not _has_invalidate_token(request):
+            user = await request.auser()
+            if not (user.is_active and user.is_staff):
+                return JsonResponse({"error": "Staff login or the cache invalidation token required"}, status=403)
+            rejected = CsrfViewMiddleware(lambda _: None).process_view(request, None, (), {})
+            if rejected is not None:
+                return rejected
+        generation = await asyncio.to_thread(get_cache().invalidate)
+        return JsonResponse({"generation": generation})
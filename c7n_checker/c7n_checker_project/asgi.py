@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'c7n_checker_project.settings')
 
 application = get_asgi_application()
+
+# Start the validation workers now, so the first request does not pay for loading c7n.
+from c7n_checker.c7n_checker_app.service import get_service  # noqa: E402
+
+get_service().warm()
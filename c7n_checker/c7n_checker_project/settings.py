@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -122,3 +123,19 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# The resident validation service, see c7n_checker_app/service.py
+C7N_CHECKER = {
+    'WORKERS': 2,
+    'MAX_CONCURRENT_REQUESTS': 16,
+    'QUEUE_TIMEOUT': 5.0,
+    'TIMEOUT': 60.0,
+    # Each run gets its own moto account; needs WORKERS > 0 to hold for concurrent runs.
+    'ISOLATE_RUNS': True,
+    # Results, see c7n_checker_app/cache.py
+    'CACHE_ENTRIES': 1024,
+    'CACHE_TTL': 3600.0,
+    'CACHE_BACKEND': None,
+    # Bearer token for POST api/cache/invalidate; without one only staff users may invalidate.
+    'INVALIDATE_TOKEN': os.environ.get('C7N_CHECKER_INVALIDATE_TOKEN'),
+}
@@ -0,0 +1,136 @@
+"""Benchmarks the docs checker's stages over a pinned snapshot of example sources.
+
+The snapshot is a folder of .rst, .py and .yaml/.yml files, checked in or unpacked from
+an archive, and identified by a digest of its contents so that two reports are only
+compared when they ran over the same examples. Every example is extracted, normalized
+and validated in this process, one after another, so the stage timings are not muddied by
+worker scheduling. Compare a report with an earlier one to catch regressions, e.g. after
+a c7n upgrade.
+"""
+import argparse
+import json
+import logging
+import platform
+from pathlib import Path
+from typing import Any, List, Optional
+
+from c7n_docs_checker import check_examples, check_examples_in_docstrings
+from c7n_docs_checker.engine import get_engine
+from c7n_docs_checker.manifest import hash_text
+from c7n_docs_checker.timing import format_table, recording, timed
+
+LOGGER = logging.getLogger(__name__)
+
+SUFFIXES = (".rst", ".py", ".yaml", ".yml")
+
+
+def snapshot_files(folder: Path) -> List[Path]:
+    """The example sources in a snapshot, in a stable order."""
+    return sorted(path for path in folder.rglob("*") if path.suffix in SUFFIXES and path.is_file())
+
+
+def snapshot_digest(folder: Path, files: List[Path]) -> str:
+    """A digest of the snapshot's file names and contents."""
+    return hash_text("\n".join(
+        f"{path.relative_to(folder).as_posix()}:{hash_text(path.read_text(encoding='utf-8'))}" for path in files))
+
+
+def examples_in(file_path: Path) -> List[str]:
+    """The YAML examples in one source file, extracted the way the checkers do."""
+    if file_path.suffix == ".rst":
+        return check_examples.extract_code_blocks_from_rst(file_path)
+    if file_path.suffix == ".py":
+        return check_examples_in_docstrings.extract_code_blocks_from_rst(file_path)
+    with timed("read"):
+        return [file_path.read_text(encoding="utf-8")]
+
+
+def run_benchmark(folder: Path, repeat: int = 1, slowest: int = 10) -> dict[str, Any]:
+    """Extracts, normalizes and validates every example in the snapshot.
+
+    Args:
+        folder (Path): The snapshot.
+        repeat (int): How many times to go over the snapshot; more runs steady the percentiles.
+        slowest (int): How many of the slowest examples to report.
+
+    Returns:
+        dict[str, Any]: The timing report, with the snapshot and environment it ran in.
+    """
+    from c7n.version import version
+
+    files = snapshot_files(folder)
+    examples = 0
+    with recording() as timings:
+        engine = get_engine()
+        for _ in range(repeat):
+            examples = 0
+            for file_path in files:
+                name = file_path.relative_to(folder).as_posix()
+                with timings.example(name):
+                    blocks = examples_in(file_path)
+                for index, block in enumerate(blocks, start=1):
+                    with timings.example(name if len(blocks) == 1 else f"{name}#{index}"):
+                        engine.validate_text(check_examples.normalize_example(block))
+                examples += len(blocks)
+
+    report = timings.report(slowest)
+    report["snapshot"] = {
+        "folder": str(folder),
+        "digest": snapshot_digest(folder, files),
+        "files": len(files),
+        "examples": examples,
+        "repeat": repeat,
+    }
+    report["environment"] = {"python": platform.python_version(), "c7n": version}
+    return report
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], max_slowdown: float) -> List[str]:
+    """The stages whose median got slower than max_slowdown times the baseline's."""
+    regressions = []
+    for stage, stats in report["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before and before["p50"] and stats["p50"] / before["p50"] > max_slowdown:
+            regressions.append(f"{stage}: p50 {before['p50'] * 1000:.2f}ms -> {stats['p50'] * 1000:.2f}ms")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the docs checker's stages over a snapshot of examples.")
+    parser.add_argument("snapshot", type=Path, help="Folder of .rst, .py and .yaml example sources.")
+    parser.add_argument("--json", type=Path, default=None, help="Write the report as JSON here.")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to go over the snapshot.")
+    parser.add_argument("--slowest", type=int, default=10, help="Number of slowest examples to list.")
+    parser.add_argument("--expect-digest", default=None, help="Fail unless the snapshot has this digest.")
+    parser.add_argument("--baseline", type=Path, default=None, help="An earlier JSON report to compare with.")
+    parser.add_argument("--max-slowdown", type=float, default=1.25,
+                        help="Fail if a stage's p50 is this many times the baseline's (default: 1.25).")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.snapshot, args.repeat, args.slowest)
+    snapshot = report["snapshot"]
+    print(f"{snapshot['examples']} example(s) from {snapshot['files']} file(s), snapshot {snapshot['digest'][:12]}, "
+          f"c7n {report['environment']['c7n']}")
+    print(format_table(report))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.expect_digest and snapshot["digest"] != args.expect_digest:
+        LOGGER.error(f"Snapshot digest {snapshot['digest']} is not the expected {args.expect_digest}")
+        return 2
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline["snapshot"]["digest"] != snapshot["digest"]:
+            LOGGER.error("The baseline ran over a different snapshot, not comparing")
+            return 2
+        regressions = compare(report, baseline, args.max_slowdown)
+        for regression in regressions:
+            LOGGER.error(f"Slower than the baseline: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    raise SystemExit(main())
@@ -1,15 +1,22 @@
-import multiprocessing
-import os
-import subprocess
 import logging
+import textwrap
+from collections import Counter
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-from docutils.core import publish_doctree
-from docutils.nodes import literal_block
+
+from c7n_docs_checker.engine import file_result, get_engine, imap_batches
+from c7n_docs_checker.exemptions import get_rules
+from c7n_docs_checker.manifest import MANIFEST_NAME, VALIDATION_CACHE_NAME, ExtractionManifest, ValidationCache
+from c7n_docs_checker.rst_blocks import yaml_blocks_in_rst
+from c7n_docs_checker.timing import example, reporting, timed
+
+
+# Docs examples annotate lines with "─▶ explanation", which is not YAML.
+ANNOTATION = "─▶"
 
 
 def extract_code_blocks_from_rst(file_path: Path) -> List[str]:
@@ -17,20 +24,7 @@ def extract_code_blocks_from_rst(file_path: Path) -> List[str]:
     with file_path.open('r', encoding='utf-8') as file:
         rst_content = file.read()
 
-    # Parse the RST content into a document tree
-    doctree = publish_doctree(rst_content)
-
-    yaml_blocks = []
-
-    # Traverse the document tree to find YAML code blocks
-    for node in doctree.traverse(literal_block):
-        # Check if the code block is labeled as YAML
-        if 'yaml' in node.get('classes', []):
-            # Collect the raw text of the code block
-            yaml_blocks.append(node.astext())
-
-    return yaml_blocks
-
+    return yaml_blocks_in_rst(rst_content)
 
 
 def go_extract() -> None:
@@ -59,6 +53,9 @@ def go_extract() -> None:
         "oci_advanced": Path(r'C:\github\cloud-custodian\docs\source\oci\advanced'),
     }
 
+    # Only sources changed since the last run are parsed, and only changed blocks are rewritten.
+    manifest = ExtractionManifest(Path("examples") / MANIFEST_NAME)
+
     for name, path in examples.items():
         current_folder = path
         rst_files = current_folder.glob('*.rst')
@@ -66,20 +63,44 @@ def go_extract() -> None:
         for rst_file in rst_files:
             # if not "Metadata" in rst_file.stem:
             #     continue
+            if manifest.unchanged(rst_file):
+                continue
             yaml_blocks = extract_code_blocks_from_rst(rst_file)
 
-            if yaml_blocks:
-                for i, yaml_block in enumerate(yaml_blocks, start=1):
-                    yaml_filename = f"examples/{name}/{rst_file.stem}_{i}.yaml" if len(
-                        yaml_blocks) > 1 else f"examples/{name}/{rst_file.stem}.yaml"
-                    os.makedirs(os.path.dirname(yaml_filename), exist_ok=True)
-                    with open(yaml_filename, 'w', encoding="utf-8") as yaml_file:
-                        yaml_file.write(yaml_block)
-                        print(f"Extracted YAML block saved to {yaml_filename}")
+            blocks = {}
+            for i, yaml_block in enumerate(yaml_blocks, start=1):
+                yaml_filename = f"examples/{name}/{rst_file.stem}_{i}.yaml" if len(
+                    yaml_blocks) > 1 else f"examples/{name}/{rst_file.stem}.yaml"
+                blocks[Path(yaml_filename)] = yaml_block
+            for yaml_filename in manifest.write_blocks(rst_file, blocks):
+                print(f"Extracted YAML block saved to {yaml_filename}")
 
+    manifest.save()
 
-def validate_file(file_path: Path) -> tuple[Path, bool, str]:
-    """Validates a YAML file using the `custodian validate` command.
+
+def normalize_example(text: str) -> str:
+    """Applies the fixups an extracted example needs before it can be validated, in memory.
+
+    Strips ─▶ annotations from the ends of lines, and wraps fragments without a
+    'policies:' header in one, indenting them to match.
+
+    Args:
+        text (str): The example as extracted.
+
+    Returns:
+        str: The text to validate.
+    """
+    with timed("normalization"):
+        if ANNOTATION in text:
+            text = "\n".join(line.split(ANNOTATION)[0] for line in text.split("\n"))
+        if "policies:" not in text:
+            text = "policies:\n" + "\n".join("  " + line for line in textwrap.dedent(text).split("\n"))
+        return text
+
+
+def validate_example(file_path: Path) -> tuple[Path, bool, str]:
+    """Validates a YAML file as the `custodian validate` command would, inside this process,
+    without applying any exemptions. The file is normalized in memory first.
 
     Args:
         file_path (Path): Path to the YAML file.
@@ -89,154 +110,68 @@ def validate_file(file_path: Path) -> tuple[Path, bool, str]:
         and any error message if the validation failed.
     """
     LOGGER.info(f"Validating {file_path}...")
+    text = normalize_example(file_path.read_text(encoding="utf-8"))
+    return file_result(file_path, get_engine().validate_text(text))
 
-    full_text = file_path.read_text(encoding="utf-8")
-    if "export OCI" in full_text:
-        # Bash, not yaml
-        return file_path, True, ""
 
-    #
-    if file_path.name in ["deployment_2.yaml"]:
-        # This is a github action
-        return file_path, True, ""
+def validate_examples(files: List[Path]) -> List[tuple[Path, bool, str]]:
+    """Validates a batch of YAML files in one pass over all of their policies, without
+    applying any exemptions. Gives the same results as validate_example on each file.
 
-    if file_path.name in ["policyStructure.yaml"]:
-        # Too heavily annotated
-        return file_path, True, ""
-    if "repos:" in full_text:
-        # Precommit
-        return file_path, True, ""
-    if "apiVersion: rbac.authorization.k8s.io/v1" in full_text:
-        # K8s
-        return file_path, True, ""
-    if "helm-values.yaml" in full_text:
-        # Helm
-        return file_path, True, ""
+    Args:
+        files (List[Path]): Paths to the YAML files.
 
-    if "account-service-limits" in full_text:
-        # Helm
-        return file_path, True, ""
+    Returns:
+        List[tuple[Path, bool, str]]: One result per file, in the same order.
+    """
+    LOGGER.info(f"Validating a batch of {len(files)} file(s)...")
+    names = [str(file_path) for file_path in files]
+    texts = []
+    for file_path, name in zip(files, names):
+        with example(name):
+            texts.append(normalize_example(file_path.read_text(encoding="utf-8")))
+    errors = get_engine().validate_texts(texts, names)
+    return [file_result(file_path, file_errors) for file_path, file_errors in zip(files, errors)]
 
-    if "ec2-checker" in full_text:
-        # Fixed but not merged.
-        return file_path, True, ""
 
-    if "remediate" in full_text:
-        # Fixed but not merged. (Error on policy:remediate resource:aws.iam)
-        return file_path, True, ""
+def validate_file(file_path: Path) -> tuple[Path, bool, str]:
+    """Validates a YAML file as the `custodian validate` command would, inside this process.
+    Examples covered by the exemptions file pass.
 
-    if "ec2-auto-tag-ownercontact" in full_text:
-        # triple nested (yaml in python in rst) extractor can't handle this ...yet.
-        return file_path, True, ""
+    Args:
+        file_path (Path): Path to the YAML file.
 
-    if "image: nginx:1.14.2" in full_text:
-        # actually k8s yaml
+    Returns:
+        tuple[Path, bool, str]: The file path, validation status (True if passed, False if failed),
+        and any error message if the validation failed.
+    """
+    rules = get_rules()
+    full_text = file_path.read_text(encoding="utf-8")
+    if rules.classify(file_path, full_text) is not None:
         return file_path, True, ""
 
-    # if "config_2.yaml" in str(file_path):
-    #     # I'm stumped. I can't figure out how to fix this
-    #     # I think it is buggy but can't figure out if it is a CC problem or a yaml policy problem.
-    #     return file_path, True, ""
-    #
-    # if "securityhub_2.yaml" in str(file_path):
-    #     # I'm stumped. I can't figure out how to fix this
-    #     # hub-finding as a mode?
-    #     return file_path, True, ""
-    # if "update-cross-connect" in full_text:
-    #     # Unknown action, valid alts are remove-tag, webhook
-    #     return file_path, True, ""
-
-    if "─▶" in full_text:
-        # read file, remove anything after ─▶ in a line by line fashion
-        # rewrite to same file
-        with file_path.open('r', encoding="utf-8") as file:
-            lines = file.readlines()
-        with file_path.open('w', encoding="utf-8") as file:
-            for line in lines:
-                if "─▶" in line:
-                    line = line.split("─▶")[0] + "\n"
-                file.write(line)
-
-    if "policies:" not in full_text:
-        return revalidate_with_header(file_path)
-
-
-
-    try:
-        result = subprocess.run(
-            ["custodian", "validate", str(file_path).replace("\\", "/")],
-            check=True,
-            capture_output=True,
-            text=True,
-            env=os.environ | {'AWS_DEFAULT_REGION': 'us-east-1'}
-        )
-        return file_path, True, ""
-    except subprocess.CalledProcessError as e:
-        if "Get the size of a group" in full_text:
-            # Intensional fragment
-            return file_path, True, ""
-
-        if "Find expiry from tag contents" in full_text:
-            # Intensional fragment
-            return file_path, True, ""
-
-        if "http://foo.com?hook-id=123" in full_text:
-            # Intensional fragment
-            return file_path, True, ""
-
-        if "discard-percent: 20" in full_text:
-            # Intensional fragment
-            return file_path, True, ""
-
-        if "discard-percent: 25" in full_text:
-            # Intensional fragment
-            return file_path, True, ""
-
-
-        # Capture and return the error message
-
-        # if ("Policy files top level keys" in e.stderr and
-        #         ("lambda_2" in str(file_path) or "lambda_8" in str(file_path))):
-        #     # Yaml fragment.
-        #     return file_path, True, ""
-
-        return file_path, False, e.stderr
-
-def revalidate_with_header(file_path: Path) -> tuple[Path, bool, str]:
-    # write a copy of the file in same place with name %_with_header.yaml
-    # add a header to the file
-    # Validate it.
-
-    with file_path.open('r', encoding="utf-8") as file:
-        full_text = file.read()
-        if "policies:" not in full_text:
-            indented_full_text = "\n".join(["  " + line for line in full_text.split("\n")])
-
-            # add the `policies:` header line
-            full_text = "policies:\n" + indented_full_text
-
-            new_file_path = file_path.with_name(file_path.stem + "_with_header.yaml")
-            with new_file_path.open('w', encoding="utf-8") as new_file:
-                new_file.write(full_text)
-
-    try:
-        result = subprocess.run(
-            ["custodian", "validate", str(new_file_path).replace("\\", "/")],
-            check=True,
-            capture_output=True,
-            text=True,
-            env=os.environ | {'AWS_DEFAULT_REGION': 'us-east-1'}
-        )
+    _, ok, error = validate_example(file_path)
+    if ok or rules.classify(file_path, full_text, error) is not None:
         return file_path, True, ""
-    except subprocess.CalledProcessError as e:
-        # Capture and return the error message
+    return file_path, False, error
 
-        if ("Policy files top level keys" in e.stderr and
-                ("lambda_2" in str(file_path) or "lambda_8" in str(file_path))):
-            # Yaml fragment.
-            return file_path, True, ""
 
-        return file_path, False, e.stderr
+def emit_normalized(files: List[Path], parent_folder: Path, destination: Path) -> None:
+    """Writes the normalized text of each example under destination, mirroring its path
+    under parent_folder, so what was validated can be inspected.
+
+    Args:
+        files (List[Path]): The examples.
+        parent_folder (Path): The folder the examples were collected from.
+        destination (Path): Where to write the normalized copies. Keep it outside
+            parent_folder, or the copies are collected as examples on the next run.
+    """
+    for file_path in files:
+        normalized_path = destination / file_path.relative_to(parent_folder)
+        normalized_path.parent.mkdir(parents=True, exist_ok=True)
+        normalized_path.write_text(normalize_example(file_path.read_text(encoding="utf-8")), encoding="utf-8")
+    LOGGER.info(f"Wrote {len(files)} normalized example(s) to {destination}.")
+
 
 def collect_yaml_files(folder: Path) -> List[Path]:
     """Collects all .yml and .yaml files from the specified folder and its subdirectories.
@@ -251,22 +186,28 @@ def collect_yaml_files(folder: Path) -> List[Path]:
     return yaml_files
 
 
-def validate_files_in_parallel(files: List[Path]) -> List[tuple[Path, bool, str]]:
-    """Validates YAML files in parallel using available CPU cores.
+def validate_files_in_parallel(files: List[Path], record: bool = False) -> List[tuple[Path, bool, str]]:
+    """Validates YAML files in parallel using available CPU cores, without applying exemptions.
+    Each worker validates a batch of files at a time.
 
     Args:
         files (List[Path]): List of YAML file paths to validate.
+        record (bool): Time the workers' stages too, see c7n_docs_checker.timing.
 
     Returns:
         List[tuple[Path, bool, str]]: A list of results, where each result is a tuple containing
         the file path, validation status, and an error message if any.
     """
-    with multiprocessing.Pool() as pool:
-        results = pool.map(validate_file, files)
+    results = []
+    for result in imap_batches(validate_examples, files, record=record):
+        # Report as batches finish, rather than all at once at the end.
+        if not result[1]:
+            LOGGER.info(f"Failed: {result[0]}")
+        results.append(result)
     # results = []
     # for file in files:
-    #     results.append(validate_file(file))
-    return results
+    #     results.append(validate_example(file))
+    return sorted(results, key=lambda result: result[0])
 
 
 def print_failures(failures: List[tuple[Path, bool, str]]) -> None:
@@ -286,36 +227,103 @@ def print_failures(failures: List[tuple[Path, bool, str]]) -> None:
         LOGGER.error("-" * 40)
 
 
-def validate_yaml_files_in_folder(parent_folder: Path) -> None:
+def print_categories(categories: Counter) -> None:
+    """Prints how many examples passed, failed, or were exempt under each category.
+
+    Args:
+        categories (Counter): Number of examples per outcome or exemption category.
+    """
+    for category, count in sorted(categories.items()):
+        LOGGER.info(f"{category}: {count}")
+
+
+def validate_yaml_files_in_folder(parent_folder: Path, normalized_folder: Optional[Path] = None,
+                                  record_timings: bool = False) -> None:
     """Traverses through the parent folder and validates all .yml and .yaml files found within
     its subdirectories.
 
     Args:
         parent_folder (Path): The root folder to start searching for YAML files.
+        normalized_folder (Optional[Path]): If given, the normalized text of every example
+            that is validated is written there too.
+        record_timings (bool): Time each stage, in this process and in the workers, and log
+            a table of the timings at the end.
     """
-    # Collect all .yml and .yaml files from the folder and its subdirectories
-    yaml_files = collect_yaml_files(parent_folder)
-
-    if not yaml_files:
-        LOGGER.info(f"No YAML files found in {parent_folder}.")
-        return
+    with reporting(record_timings, LOGGER):
+        # Collect all .yml and .yaml files from the folder and its subdirectories
+        yaml_files = collect_yaml_files(parent_folder)
+
+        if not yaml_files:
+            LOGGER.info(f"No YAML files found in {parent_folder}.")
+            return
+
+        LOGGER.info(f"Found {len(yaml_files)} YAML file(s) to validate.")
+
+        # Classify the exempt examples here, so they are never sent to the workers
+        rules = get_rules()
+        texts = {file_path: file_path.read_text(encoding="utf-8") for file_path in yaml_files}
+        categories = Counter()
+        to_validate = []
+        for file_path in yaml_files:
+            exemption = rules.classify(file_path, texts[file_path])
+            if exemption is None:
+                to_validate.append(file_path)
+            else:
+                categories[exemption.category] += 1
+
+        if normalized_folder is not None:
+            emit_normalized(to_validate, parent_folder, normalized_folder)
+
+        # Skip files validated before with the same content and c7n version
+        cache = ValidationCache(parent_folder / VALIDATION_CACHE_NAME)
+        results = []
+        pending = []
+        for file_path in to_validate:
+            cached = cache.get(file_path, texts[file_path])
+            if cached is None:
+                pending.append(file_path)
+            else:
+                results.append((file_path, *cached))
+        LOGGER.info(f"{len(results)} file(s) unchanged since they were last validated.")
+
+        # Validate files in parallel
+        for file_path, ok, error in validate_files_in_parallel(pending, record_timings):
+            cache.put(file_path, texts[file_path], ok, error)
+            results.append((file_path, ok, error))
+        cache.save()
+
+        # Collect failures, other than the expected ones
+        failures = []
+        for file_path, ok, error in results:
+            if ok:
+                categories["passed"] += 1
+                continue
+            exemption = rules.classify(file_path, texts[file_path], error)
+            if exemption is None:
+                categories["failed"] += 1
+                failures.append((file_path, ok, error))
+            else:
+                categories[exemption.category] += 1
+        print_categories(categories)
+
+        # Print out the results of failed validations
+        print_failures(failures)
 
-    LOGGER.info(f"Found {len(yaml_files)} YAML file(s) to validate.")
 
-    # Validate files in parallel
-    results = validate_files_in_parallel(yaml_files)
 
-    # Collect failures
-    failures = [result for result in results if not result[1]]
-
-    # Print out the results of failed validations
-    print_failures(failures)
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Extract the YAML examples from the Cloud Custodian docs and validate them.")
+    parser.add_argument("--emit-normalized", nargs="?", const="normalized", default=None, metavar="DIR",
+                        help="Also write the normalized examples that get validated to DIR (default: normalized).")
+    parser.add_argument("--timings", action="store_true", help="Log how long each stage took.")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     go_extract()
     # Define the parent folder containing all subfolders
     parent_folder = Path("examples")
 
     # Start the validation process
-    validate_yaml_files_in_folder(parent_folder)
+    validate_yaml_files_in_folder(parent_folder, Path(args.emit_normalized) if args.emit_normalized else None,
+                                  record_timings=args.timings)
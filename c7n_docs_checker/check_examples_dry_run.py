@@ -1,15 +1,15 @@
-import multiprocessing
-import subprocess
 import logging
 from pathlib import Path
 from typing import List
 
+from c7n_docs_checker.engine import get_engine, imap_files
+
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
 def validate_file(file_path: Path) -> tuple[Path, bool, str]:
-    """Validates a YAML file using the `custodian validate` command.
+    """Dry runs a YAML file as `custodian run --dry-run` would, inside this process.
 
     Args:
         file_path (Path): Path to the YAML file.
@@ -19,17 +19,8 @@ def validate_file(file_path: Path) -> tuple[Path, bool, str]:
         and any error message if the validation failed.
     """
     LOGGER.info(f"Validating {file_path}...")
-    try:
-        result = subprocess.run(
-            ["custodian", "run", str(file_path), "--output-dir=state", "--dry-run", "--verbose"],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        return file_path, True, ""
-    except subprocess.CalledProcessError as e:
-        # Capture and return the error message
-        return file_path, False, e.stderr
+    # Each file gets its own output directory, so workers never write to the same one.
+    return get_engine().dry_run_file(file_path, output_dir=str(Path("state") / file_path.stem))
 
 
 def validate_files_in_parallel(folder: Path) -> List[tuple[Path, bool, str]]:
@@ -43,9 +34,13 @@ def validate_files_in_parallel(folder: Path) -> List[tuple[Path, bool, str]]:
         the file path, validation status, and an error message if any.
     """
     yaml_files = list(folder.glob("*.yaml"))
-    with multiprocessing.Pool() as pool:
-        results = pool.map(validate_file, yaml_files)
-    return results
+    results = []
+    for result in imap_files(validate_file, yaml_files):
+        # Report as files finish, rather than all at once at the end.
+        if not result[1]:
+            LOGGER.warning(f"Failed: {result[0]}")
+        results.append(result)
+    return sorted(results, key=lambda result: result[0])
 
 
 def print_failures(failures: List[tuple[Path, bool, str]]) -> None:
@@ -66,6 +61,14 @@ def print_failures(failures: List[tuple[Path, bool, str]]) -> None:
 
 
 if __name__ == "__main__":
+    import sys
+
+    if "--moto" in sys.argv:
+        # Offline, against a local moto server, with timings and API call counts.
+        from c7n_docs_checker.moto_harness import main
+
+        raise SystemExit(main([arg for arg in sys.argv[1:] if arg != "--moto"]))
+
     folder = Path("examples")
 
     # Validate files in parallel
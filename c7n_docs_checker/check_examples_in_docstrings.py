@@ -1,10 +1,13 @@
+import io
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from docutils.core import publish_doctree
-from docutils.nodes import literal_block
-from ruamel.yaml import YAML
+from c7n_docs_checker.engine import imap_files
+from c7n_docs_checker.manifest import MANIFEST_NAME, ExtractionManifest
+from c7n_docs_checker.rst_blocks import yaml_blocks_in_rst
+from c7n_docs_checker.timing import reporting
+from c7n_make.yaml_loading import round_trip_yaml, safe_load
 
 
 LOGGER = logging.getLogger(__name__)
@@ -37,25 +40,32 @@ def extract_docstrings(source_code: str) -> List[str]:
     return docstrings
 
 
-def fix_policies_file(file_path: Path) -> None:
+def fix_policies_text(text: str) -> str:
     """
-    Reads a YAML file, checks for the 'policies:' header, and ensures the
-    content is a list under the 'policies' key.
+    Ensures YAML text is a list of policies under the 'policies' key.
 
     Args:
-        file_path (Path): The path to the file that needs to be fixed.
+        text (str): The YAML text to fix.
+
+    Returns:
+        str: The corrected YAML text, or the original text if it needs no fixing or
+        cannot be fixed.
     """
-    # Step 1: Read the file
+    # Step 1: Parse the text. The fast loader is enough to tell whether there is anything
+    # to fix; the slow round trip loader is only needed when the text gets rewritten.
     try:
-        with file_path.open("r", encoding="utf-8") as file:
-            yaml = YAML(typ='rt')
-            data = yaml.load(file)
-    except FileNotFoundError:
-        LOGGER.error(f"File not found: {file_path}")
-        return
+        data = safe_load(text)
+        if isinstance(data, dict) and 'policies' in data:
+            return text
+        yaml = round_trip_yaml()
+        data = yaml.load(text)
     except Exception as e:
-        LOGGER.error(f"Error reading YAML file {file_path}: {e}")
-        return
+        LOGGER.error(f"Error reading YAML: {e}")
+        return text
+    # Empty or comment only blocks load as None, plain text as a string
+    if not isinstance(data, (dict, list)):
+        LOGGER.error("Unexpected YAML structure. Expected a list or dict.")
+        return text
 
     # Step 2: Check if 'policies:' header exists
     if 'policies' not in data:
@@ -65,17 +75,41 @@ def fix_policies_file(file_path: Path) -> None:
             data = {'policies': [data]}
             LOGGER.info("Converted dictionary to a list under 'policies:'")
         # If the data is a list, nest it under 'policies'
-        elif isinstance(data, list):
+        else:
             data = {'policies': data}
             LOGGER.info("Wrapped list under 'policies:'")
-        else:
-            LOGGER.error("Unexpected YAML structure. Expected a list or dict.")
-            return
 
-    # Step 3: Write the corrected data back to the file
+    # Step 3: Dump the corrected data
+    try:
+        stream = io.StringIO()
+        yaml.dump(data, stream)
+        return stream.getvalue()
+    except Exception as e:
+        LOGGER.error(f"Error writing YAML: {e}")
+        return text
+
+
+def fix_policies_file(file_path: Path) -> None:
+    """
+    Reads a YAML file, checks for the 'policies:' header, and ensures the
+    content is a list under the 'policies' key.
+
+    Args:
+        file_path (Path): The path to the file that needs to be fixed.
+    """
+    try:
+        with file_path.open("r", encoding="utf-8") as file:
+            text = file.read()
+    except FileNotFoundError:
+        LOGGER.error(f"File not found: {file_path}")
+        return
+
+    fixed = fix_policies_text(text)
+    if fixed == text:
+        return
     try:
         with file_path.open("w", encoding="utf-8") as file:
-            yaml.dump(data, file)
+            file.write(fixed)
         LOGGER.info(f"File corrected and saved: {file_path}")
     except Exception as e:
         LOGGER.error(f"Error writing YAML file {file_path}: {e}")
@@ -130,20 +164,8 @@ def fix_policies_file(file_path: Path) -> None:
 #     LOGGER.info(f"File corrected and saved: {file_path}")
 
 def yaml_blocks_in_rst_string(rst_content: str) -> List[str]:
-    # Parse the RST content into a document tree
-    doctree = publish_doctree(rst_content)
-
-    yaml_blocks = []
-
-    # Traverse the document tree to find YAML code blocks
-    for node in doctree.traverse(literal_block):
-        # Check if the code block is labeled as YAML
-        if 'yaml' in node.get('classes', []):
-            # Collect the raw text of the code block
-            print(node)
-            yaml_blocks.append(node.astext())
-
-    return yaml_blocks
+    # Docstrings are rarely full RST documents; only unusual ones need the docutils parser
+    return yaml_blocks_in_rst(rst_content)
 
 
 def extract_code_blocks_from_rst(file_path: Path) -> List[str]:
@@ -178,8 +200,27 @@ def extract_code_blocks_from_rst(file_path: Path) -> List[str]:
     return all_yaml_blocks
 
 
+def extract_yaml_snippets(py_file: Path) -> tuple[Path, List[str], str]:
+    """
+    Extracts the YAML blocks from one Python file, each already fixed to have a
+    'policies:' header. Runs in the extraction worker processes.
+
+    Args:
+        py_file (Path): The Python source file.
+
+    Returns:
+        tuple[Path, List[str], str]: The file, its fixed YAML blocks and an error message,
+        empty if extraction succeeded.
+    """
+    try:
+        yaml_blocks = extract_code_blocks_from_rst(py_file)
+        return py_file, [fix_policies_text(yaml_block) for yaml_block in yaml_blocks], ""
+    except Exception as e:
+        return py_file, [], str(e)
+
+
 def save_yaml_snippets(source_directory: Path, destination_dir: Path, source_file: Path,
-                       yaml_blocks: List[str]) -> None:
+                       yaml_blocks: List[str], manifest: Optional[ExtractionManifest] = None) -> None:
     """
     Save extracted YAML blocks into separate .yml files in the destination directory,
     while preserving the source file's directory structure.
@@ -187,52 +228,63 @@ def save_yaml_snippets(source_directory: Path, destination_dir: Path, source_fil
     Args:
         destination_dir (Path): The base directory where YAML files should be saved.
         source_file (Path): The source Python file from which YAML was extracted.
-        yaml_blocks (List[str]): A list of YAML snippets to be saved.
+        yaml_blocks (List[str]): A list of YAML snippets to be saved, already fixed
+            with fix_policies_text.
+        manifest (Optional[ExtractionManifest]): When given, blocks unchanged since the
+            last extraction are not rewritten and stale outputs are removed.
     """
     relative_path = source_file.relative_to(source_directory)
     file_stem = relative_path.stem
     relative_dir = relative_path.parent
-
-    # Ensure the corresponding sub-directory in the destination exists
     destination_subdir = destination_dir / relative_dir
-    destination_subdir.mkdir(parents=True, exist_ok=True)
-
-    for index, yaml_content in enumerate(yaml_blocks, start=1):
-        yaml_filename = f"{file_stem}_{index}.yml"
-        yaml_file_path = destination_subdir / yaml_filename
 
-        # Write the YAML content to the file
-        with yaml_file_path.open("w", encoding="utf-8") as yaml_file:
-            yaml_file.write(yaml_content)
+    blocks = {destination_subdir / f"{file_stem}_{index}.yml": yaml_content
+              for index, yaml_content in enumerate(yaml_blocks, start=1)}
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = ExtractionManifest(destination_dir / MANIFEST_NAME)
 
+    for yaml_file_path in manifest.write_blocks(source_file, blocks):
         LOGGER.info(f"Saved YAML block to: {yaml_file_path}")
-        fix_policies_file(yaml_file_path)
+
+    if own_manifest:
+        manifest.save()
 
 
-def process_py_files(source_dir: Path, destination_dir: Path) -> None:
+def process_py_files(source_dir: Path, destination_dir: Path, processes: Optional[int] = None,
+                     record_timings: bool = False) -> None:
     """
     Walk through the source directory, find .py files, extract YAML blocks,
     and save them to the destination directory, preserving the folder structure.
 
+    Files are parsed on a process pool; this process is the only one writing files.
+
     Args:
         source_dir (Path): The root directory to search for .py files.
         destination_dir (Path): The directory where extracted YAML files will be saved.
+        processes (Optional[int]): Number of worker processes, defaults to the CPU count.
+        record_timings (bool): Time the workers' stages and log a table of the timings at the end.
     """
-    # Recursively search for Python files in the source directory
-    for py_file in source_dir.rglob("*.py"):
-        LOGGER.info(f"Processing file: {py_file}")
-        try:
-            # Extract YAML code blocks from the Python file
-            yaml_blocks = extract_code_blocks_from_rst(py_file)
-
-            if yaml_blocks:
-                # Save extracted YAML blocks to destination directory
-                save_yaml_snippets(source_dir, destination_dir, py_file, yaml_blocks)
-            else:
+    with reporting(record_timings, LOGGER):
+        # Files unchanged since the last run are skipped without being parsed
+        manifest = ExtractionManifest(destination_dir / MANIFEST_NAME)
+        py_files = [py_file for py_file in source_dir.rglob("*.py") if not manifest.unchanged(py_file)]
+        LOGGER.info(f"Extracting YAML blocks from {len(py_files)} changed file(s).")
+
+        for py_file, yaml_blocks, error in imap_files(extract_yaml_snippets, py_files, processes, warm=False,
+                                                         record=record_timings):
+            if error:
+                LOGGER.error(f"Failed to process {py_file}: {error}")
+                continue
+            if not yaml_blocks:
                 LOGGER.info(f"No YAML blocks found in {py_file}")
 
-        except Exception as e:
-            LOGGER.error(f"Failed to process {py_file}: {e}")
+            # Save extracted YAML blocks to destination directory. Files without
+            # blocks are recorded too, so they are skipped next time.
+            save_yaml_snippets(source_dir, destination_dir, py_file, yaml_blocks, manifest)
+
+        manifest.save()
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,404 @@
+"""In-process replacement for running one ``custodian`` subprocess per example file.
+
+Each ``custodian validate`` subprocess pays for interpreter startup and for importing c7n
+and its resources, a second or two per file. The engine loads c7n, every installed provider
+and the compiled schema once per process and then validates files through the library,
+following the same steps as ``custodian validate``: structure, schema, then per policy
+validation. Results are the same ``(path, ok, error)`` tuples the checkers always used.
+"""
+import functools
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sequence, TypeVar
+
+import yaml
+
+from c7n_docs_checker.timing import add_samples, apportion, example, hold, recorded, recording, timed
+from c7n_make.schema import (DEFAULT_SCHEMA_DIR, SchemaValidators, load_providers, load_schema,
+                             resource_types)
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The loggers c7n logs to, see ValidationEngine.run_file.
+C7N_LOGGERS = ("custodian", "c7n")
+
+
+class ValidationEngine:
+    """c7n, its providers and the policy schema, loaded once and reused for every file."""
+
+    def __init__(self, schema_dir: Optional[Path] = DEFAULT_SCHEMA_DIR) -> None:
+        from c7n.structure import StructureParser
+
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        self.providers = load_providers()
+        self.schema = load_schema(schema_dir)
+        self.validators = SchemaValidators(self.schema)
+        self.validator = self.validators.validator
+        self.structure = StructureParser()
+
+    def validator_for(self, resource_types: frozenset) -> Any:
+        """A validator whose policy schema only allows the given resource types, see
+        c7n_make.schema.SchemaValidators."""
+        return self.validators.validator_for(resource_types)
+
+    def schema_errors(self, data: dict[str, Any]) -> list[Any]:
+        """The errors ``custodian validate`` would report, using the compiled validator.
+
+        Like c7n.schema.validate, only the first specific error is reported.
+        """
+        from c7n.schema import check_unique, is_c7n_placeholder, policy_error_scope, specific_error
+
+        errors = []
+        for error in self.validator_for(resource_types(data)).iter_errors(data):
+            try:
+                error = specific_error(error)
+                if error.validator == "type" and is_c7n_placeholder(error.instance):
+                    continue
+                return [policy_error_scope(error, data)]
+            except Exception:
+                LOGGER.exception("specific_error failed, traceback, followed by fallback")
+                errors.append(error)
+        if not errors:
+            unique = check_unique(data)
+            return [unique[0]] if unique else []
+        return errors[:1]
+
+    def validate_text(self, text: str) -> list[str]:
+        """Validates the text of a policy file.
+
+        Returns:
+            list[str]: The error messages, empty if the policies are valid.
+        """
+        from c7n.commands import DuplicateKeyCheckLoader
+        from c7n.exceptions import PolicyValidationError
+
+        try:
+            with timed("yaml_parse"):
+                data = yaml.load(text, Loader=DuplicateKeyCheckLoader)  # nosec, safe loader derived
+        except yaml.YAMLError as e:
+            return [f"yaml syntax error: {e}"]
+        try:
+            with timed("structure"):
+                self.structure.validate(data)
+        except PolicyValidationError as e:
+            return [str(e)]
+
+        with timed("schema"):
+            errors = [str(error) for error in self.schema_errors(data)]
+        if errors:
+            return errors
+        with timed("policy_validation"):
+            return self.validate_policies(data)
+
+    def validate_texts(self, texts: list[str], names: Optional[list[str]] = None) -> list[list[str]]:
+        """Validates many policy files with one schema pass over all of their policies.
+
+        The policies of the files that pass the structure check are merged into one
+        collection per set of resource types, in order, and each schema error is mapped back
+        to the file its policy came from by position, so duplicate names across files do
+        not matter. Uniqueness
+        and per policy validation are still checked file by file. The errors are the same
+        as validate_text would report for each file.
+
+        Args:
+            texts (list[str]): The policy files' text.
+            names (Optional[list[str]]): The files' names, which stage timings are attributed to.
+                The time of each schema pass is split between its files by number of policies.
+
+        Returns:
+            list[list[str]]: The error messages for each text, empty where the policies are valid.
+        """
+        from c7n.commands import DuplicateKeyCheckLoader
+        from c7n.exceptions import PolicyValidationError
+        from c7n.schema import check_unique, is_c7n_placeholder, policy_error_scope, specific_error
+
+        names = names if names is not None else [""] * len(texts)
+        results: list[Optional[list[str]]] = [None] * len(texts)
+        batched: dict[int, dict[str, Any]] = {}
+        # Files are merged with the others using the same resource types, so that each
+        # collection is validated against the same narrowed schema as its files would be.
+        groups: dict[frozenset, tuple[dict[str, list[Any]], list[tuple[int, int]]]] = {}
+        for index, text in enumerate(texts):
+            try:
+                with example(names[index]), timed("yaml_parse"):
+                    data = yaml.load(text, Loader=DuplicateKeyCheckLoader)  # nosec, safe loader derived
+                with example(names[index]), timed("structure"):
+                    self.structure.validate(data)
+            except (yaml.YAMLError, PolicyValidationError):
+                # Reported the same way as for a single file
+                with example(names[index]):
+                    results[index] = self.validate_text(text)
+                continue
+            if set(data) != {"policies"}:
+                # Other top level keys, like vars, apply to the whole file.
+                with example(names[index]):
+                    results[index] = self.validate_text(text)
+                continue
+            batched[index] = data
+            # Merged collection, and position in it -> (file, position in the file)
+            merged, owners = groups.setdefault(resource_types(data), ({"policies": []}, []))
+            for position, policy_data in enumerate(data["policies"]):
+                merged["policies"].append(policy_data)
+                owners.append((index, position))
+
+        schema_errors: dict[int, list[Any]] = {}
+        fallback: dict[int, list[Any]] = {}
+        for types, (merged, owners) in groups.items():
+            start = time.perf_counter()
+            for error in self.validator_for(types).iter_errors(merged):
+                path = list(error.absolute_path)
+                if len(path) < 2 or path[0] != "policies":
+                    # Not something any one file caused; let each file report its own errors.
+                    LOGGER.warning("Schema error outside of any policy, validating files one by one: %s",
+                                   error.message)
+                    one_by_one = []
+                    for text, name in zip(texts, names):
+                        with example(name):
+                            one_by_one.append(self.validate_text(text))
+                    return one_by_one
+                index, position = owners[path[1]]
+                if index in schema_errors:
+                    continue
+                try:
+                    error = specific_error(error)
+                    if error.validator == "type" and is_c7n_placeholder(error.instance):
+                        continue
+                    error = policy_error_scope(error, merged)
+                    if list(error.relative_path)[:1] == ["policies"]:
+                        error.relative_path[1] = position
+                    schema_errors[index] = [error]
+                except Exception:
+                    LOGGER.exception("specific_error failed, traceback, followed by fallback")
+                    fallback.setdefault(index, []).append(error)
+            shares: dict[str, int] = {}
+            for index, _ in owners:
+                shares[names[index]] = shares.get(names[index], 0) + 1
+            apportion("schema", time.perf_counter() - start, shares)
+
+        for index, data in batched.items():
+            errors = schema_errors.get(index) or fallback.get(index, [])[:1]
+            if not errors:
+                unique = check_unique(data)
+                errors = [unique[0]] if unique else []
+            if errors:
+                results[index] = [str(error) for error in errors]
+                continue
+            with example(names[index]), timed("policy_validation"):
+                results[index] = self.validate_policies(data)
+        return results
+
+    def validate_policies(self, data: dict[str, Any]) -> list[str]:
+        """Runs each policy's own validation, as ``custodian validate`` does after the schema."""
+        from c7n.config import Bag, Config
+        from c7n.policy import Policy
+
+        errors = []
+        null_config = Config.empty(dryrun=True, account_id="na", region="na")
+        for policy_data in data.get("policies", ()):
+            try:
+                Policy(policy_data, null_config, Bag()).validate()
+            except Exception as e:
+                errors.append(f"Policy: {policy_data.get('name', 'unknown')} is invalid: {e}")
+        return errors
+
+    def validate_file(self, file_path: Path) -> tuple[Path, bool, str]:
+        """Validates a YAML file, as ``custodian validate`` would.
+
+        Returns:
+            tuple[Path, bool, str]: The file path, validation status (True if passed, False if failed),
+            and any error message if the validation failed.
+        """
+        return file_result(file_path, self.validate_text(file_path.read_text(encoding="utf-8")))
+
+    def validate_files(self, file_paths: list[Path]) -> list[tuple[Path, bool, str]]:
+        """Validates many YAML files with one schema pass, see validate_texts.
+
+        Returns:
+            list[tuple[Path, bool, str]]: The same results validate_file gives, one per file.
+        """
+        texts = [file_path.read_text(encoding="utf-8") for file_path in file_paths]
+        errors = self.validate_texts(texts, [str(file_path) for file_path in file_paths])
+        return [file_result(file_path, file_errors) for file_path, file_errors in zip(file_paths, errors)]
+
+    def dry_run_file(self, file_path: Path, output_dir: str = "state",
+                     args: Sequence[str] = ()) -> tuple[Path, bool, str]:
+        """Runs ``custodian run --dry-run`` on a file inside this process.
+
+        Args:
+            file_path (Path): The policy file.
+            output_dir (str): Where custodian writes its output.
+            args (Sequence[str]): More ``custodian run`` options.
+
+        Returns:
+            tuple[Path, bool, str]: The file path, whether the run succeeded, and its log if it did not.
+        """
+        ok, log = self.run_file(file_path, output_dir, ["--dry-run", *args])
+        return file_path, ok, "" if ok else log
+
+    def run_file(self, file_path: Path, output_dir: str, args: Sequence[str] = ()) -> tuple[bool, str]:
+        """Runs ``custodian run --verbose`` on a file inside this process.
+
+        Args:
+            file_path (Path): The policy file.
+            output_dir (str): Where custodian writes its output.
+            args (Sequence[str]): More ``custodian run`` options.
+
+        Returns:
+            tuple[bool, str]: Whether the run succeeded, and what it logged on this thread at INFO and above.
+        """
+        from c7n.cli import main as c7n_main
+
+        log = io.StringIO()
+        handler = logging.StreamHandler(log)
+        handler.setFormatter(logging.Formatter("%(name)s:%(levelname)s %(message)s"))
+        handler.setLevel(logging.INFO)
+        # Runs on other threads, with in-process workers, log to the same loggers.
+        thread = threading.get_ident()
+        handler.addFilter(lambda record: record.thread == thread)
+        # c7n logs what a run found at INFO, which a process without logging configured drops
+        # before any handler sees it. Only c7n's own loggers are lowered, and only to the level
+        # c7n logs at by default; the root logger and other handlers are left alone.
+        for name in C7N_LOGGERS:
+            c7n_logger = logging.getLogger(name)
+            if c7n_logger.getEffectiveLevel() > logging.INFO:
+                c7n_logger.setLevel(logging.INFO)
+        root = logging.getLogger()
+        # c7n's own logging.basicConfig is a no op once the root logger has a handler.
+        root.addHandler(handler)
+        try:
+            c7n_main(["run", str(file_path), f"--output-dir={output_dir}", "--verbose", *args])
+            ok = True
+        except SystemExit as e:
+            ok = not e.code
+        except Exception:
+            LOGGER.exception("Run of %s failed", file_path)
+            ok = False
+        finally:
+            root.removeHandler(handler)
+        return ok, log.getvalue()
+
+
+def file_result(file_path: Path, errors: list[str]) -> tuple[Path, bool, str]:
+    """The ``(path, ok, error)`` result for a file's validation errors, worded like ``custodian validate``."""
+    if not errors:
+        return file_path, True, ""
+    return file_path, False, "\n".join([f"Configuration invalid: {file_path}"] + errors)
+
+
+_ENGINE: Optional[ValidationEngine] = None
+
+
+def get_engine() -> ValidationEngine:
+    """Returns this process's engine, creating it on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        with timed("engine_startup"):
+            _ENGINE = ValidationEngine()
+    return _ENGINE
+
+
+def warm_worker(environment: Optional[dict[str, Optional[str]]] = None, record: bool = False) -> None:
+    """Pool initializer, pays for importing c7n and its providers before the first file arrives.
+
+    Args:
+        environment (Optional[dict[str, Optional[str]]]): Environment variables to set first, e.g. to
+            point the AWS SDK at a local endpoint. A None value removes the variable.
+        record (bool): Time the engine's start up, to be sent back with the worker's first
+            result, see c7n_docs_checker.timing.recorded.
+    """
+    for name, value in (environment or {}).items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    if not record:
+        get_engine()
+        return
+    with recording() as timings:
+        get_engine()
+    hold(timings.samples)
+
+
+def adaptive_chunksize(count: int, processes: int) -> int:
+    """Small chunks when there are few files per worker, so one slow file cannot hold up a
+    whole chunk at the tail of a run; larger ones for big runs to cut scheduling overhead."""
+    return max(1, min(16, count // (processes * 16)))
+
+
+def imap_files(func: Callable[[Path], T], files: list[Path],
+               processes: Optional[int] = None, warm: bool = True,
+               environment: Optional[dict[str, Optional[str]]] = None, record: bool = False) -> Iterator[T]:
+    """Applies func to every file on a pool of pre-warmed workers, yielding results as they finish.
+
+    The largest files are handed out first, since they tend to be the slowest to check.
+
+    Args:
+        func (Callable[[Path], T]): A picklable, module level function.
+        files (list[Path]): The files to check.
+        processes (Optional[int]): Number of worker processes, defaults to the CPU count.
+        warm (bool): Load the validation engine in each worker before it starts. Jobs that
+            do not validate anything, like extraction, can skip it.
+        environment (Optional[dict[str, Optional[str]]]): Environment variables for the warmed workers,
+            see warm_worker.
+        record (bool): Time the stages in the workers too, adding their samples to this process's
+            recording, see c7n_docs_checker.timing.
+    """
+    processes = processes or os.cpu_count() or 1
+    ordered = sorted(files, key=_size, reverse=True)
+    if warm:
+        # Generate the schema here if it is not cached yet, rather than in every worker at once.
+        load_schema()
+    with multiprocessing.Pool(processes, initializer=warm_worker if warm else None,
+                              initargs=(environment, record) if warm else ()) as pool:
+        chunksize = adaptive_chunksize(len(ordered), processes)
+        if not record:
+            yield from pool.imap_unordered(func, ordered, chunksize=chunksize)
+            return
+        for result, samples in pool.imap_unordered(functools.partial(recorded, func), ordered, chunksize=chunksize):
+            add_samples(samples)
+            yield result
+
+
+def imap_batches(func: Callable[[list[Path]], list[T]], files: list[Path],
+                 processes: Optional[int] = None, max_batch: int = 64, record: bool = False) -> Iterator[T]:
+    """Like imap_files, but hands each worker a batch of files at a time, so per call costs
+    are paid once per batch. Results are yielded as each batch finishes.
+
+    Args:
+        func (Callable[[list[Path]], list[T]]): A picklable, module level function taking a
+            batch of files and returning their results.
+        files (list[Path]): The files to check.
+        processes (Optional[int]): Number of worker processes, defaults to the CPU count.
+        max_batch (int): Largest number of files in one batch.
+        record (bool): Time the stages in the workers too, see imap_files.
+    """
+    processes = processes or os.cpu_count() or 1
+    ordered = sorted(files, key=_size, reverse=True)
+    # At least four batches per worker, so the work still spreads evenly at the end.
+    size = max(1, min(max_batch, -(-len(ordered) // (processes * 4))))
+    # Striding keeps the batches of similar total size, largest files first.
+    count = -(-len(ordered) // size)
+    batches = [ordered[start::count] for start in range(count)]
+    load_schema()
+    with multiprocessing.Pool(processes, initializer=warm_worker, initargs=(None, record)) as pool:
+        if not record:
+            for results in pool.imap_unordered(func, batches):
+                yield from results
+            return
+        for results, samples in pool.imap_unordered(functools.partial(recorded, func), batches):
+            add_samples(samples)
+            yield from results
+
+
+def _size(file_path: Path) -> int:
+    try:
+        return file_path.stat().st_size
+    except OSError:
+        return 0
@@ -0,0 +1,90 @@
+"""Declarative exemptions for docs examples that are not, or not yet, valid policies.
+
+The rules live in exemptions.toml. All their text conditions are compiled into one regular
+expression, so classifying an example is a single pass over its text however many rules
+there are.
+"""
+import re
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Optional
+
+import tomlkit
+
+DEFAULT_RULES = Path(__file__).with_name("exemptions.toml")
+
+
+@dataclass(frozen=True)
+class Exemption:
+    """One rule from the exemptions file. Conditions left as None always hold."""
+    category: str
+    reason: str = ""
+    text: Optional[str] = None
+    name: Optional[str] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+    def applies(self, file_path: Path, error: Optional[str]) -> bool:
+        """Checks the conditions other than text, which the combined pattern already matched."""
+        if self.error is not None and (error is None or self.error not in error):
+            return False
+        if self.name is not None and file_path.name != self.name:
+            return False
+        return self.path is None or self.path in str(file_path)
+
+
+class ExemptionRules:
+    """Classifies examples against a list of exemptions, first applicable rule wins."""
+
+    def __init__(self, exemptions: list[Exemption]) -> None:
+        self.exemptions = exemptions
+        # Rule index -> text; one named group per text condition.
+        texts = {index: exemption.text for index, exemption in enumerate(exemptions) if exemption.text}
+        self.pattern = re.compile("|".join(f"(?P<r{index}>{re.escape(text)})" for index, text in texts.items())) \
+            if texts else None
+        # Rules without a text condition are candidates for every example.
+        self.untexted = [index for index, exemption in enumerate(exemptions) if not exemption.text]
+
+    def classify(self, file_path: Path, text: str, error: Optional[str] = None) -> Optional[Exemption]:
+        """Finds the exemption for an example.
+
+        Args:
+            file_path (Path): The example's file.
+            text (str): The example's content.
+            error (Optional[str]): The validation error, if the example has been validated
+                and failed. Without it, only the rules that skip validation are considered.
+
+        Returns:
+            Optional[Exemption]: The first applicable exemption, or None.
+        """
+        candidates = set(self.untexted)
+        # Matches do not overlap, so a text found only inside another rule's match is missed;
+        # the texts in the rules file are distinct enough for that not to matter.
+        if self.pattern is not None:
+            for match in self.pattern.finditer(text):
+                candidates.add(int(match.lastgroup[1:]))
+        for index in sorted(candidates):
+            if self.exemptions[index].applies(file_path, error):
+                return self.exemptions[index]
+        return None
+
+
+def load_rules(path: Path = DEFAULT_RULES) -> ExemptionRules:
+    """Reads an exemptions file.
+
+    Args:
+        path (Path): The TOML file, with one [[exemption]] table per rule.
+
+    Returns:
+        ExemptionRules: The compiled rules.
+    """
+    with path.open("r", encoding="utf-8") as f:
+        data = tomlkit.parse(f.read()).unwrap()
+    return ExemptionRules([Exemption(**exemption) for exemption in data.get("exemption", [])])
+
+
+@cache
+def get_rules() -> ExemptionRules:
+    """The default rules, loaded once per process."""
+    return load_rules()
@@ -0,0 +1,172 @@
+"""Incremental extraction and validation for the docs checker.
+
+Parsing the full upstream docs tree with docutils takes minutes, while most runs only
+touch a handful of source files. The extraction manifest remembers each source file's
+size, mtime and content hash, plus the hash of every YAML block extracted from it, so
+unchanged sources are not parsed again and unchanged blocks are not rewritten, as long as
+the extraction code is unchanged too. The
+validation cache remembers the result for each block's content, per c7n version and per
+version of the checker's own code.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".extract_manifest.json"
+VALIDATION_CACHE_NAME = ".validation_cache.json"
+
+
+def hash_text(text: str) -> str:
+    """Returns the sha256 hex digest of some text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _code_key(modules: tuple[Any, ...]) -> str:
+    return hash_text("".join(Path(module.__file__).read_text(encoding="utf-8") for module in modules))[:12]
+
+
+def checker_key() -> str:
+    """A hash of the code that decides whether an example passes: the normalization, the
+    validation engine and the schema narrowing. Changing any of them invalidates the cache."""
+    from c7n_docs_checker import check_examples, engine
+    from c7n_make import schema
+
+    return _code_key((check_examples, engine, schema))
+
+
+def extractor_key() -> str:
+    """A hash of the code that extracts and fixes up the blocks: the RST block finder and the
+    docstring extraction. Changing any of them re-extracts every source."""
+    from c7n_docs_checker import check_examples, check_examples_in_docstrings, rst_blocks
+
+    return _code_key((check_examples, check_examples_in_docstrings, rst_blocks))
+
+
+def _read_json(path: Path) -> dict[str, Any]:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: Path, data: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(temp_name, path)
+
+
+class ExtractionManifest:
+    """Which blocks were extracted from which source, and when.
+
+    Each source entry holds its size, mtime, content hash and a map of output file -> block hash.
+    Entries recorded by another version of the extraction code all count as changed, but their
+    outputs are still known, so blocks that are no longer extracted get deleted.
+    """
+
+    def __init__(self, path: Path, version: Optional[str] = None) -> None:
+        self.path = path
+        self.version = extractor_key() if version is None else version
+        saved = _read_json(path)
+        self.sources: dict[str, dict[str, Any]] = saved.get("sources", {})
+        self.stale = saved.get("version") != self.version
+
+    def unchanged(self, source: Path) -> bool:
+        """True if the source is as it was when last extracted and its outputs still exist.
+
+        The size and mtime are checked first; the content is only hashed when they differ.
+        """
+        entry = self.sources.get(str(source))
+        if self.stale or entry is None or not all(Path(output).exists() for output in entry["outputs"]):
+            return False
+        stat = source.stat()
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if entry["hash"] != hash_text(source.read_text(encoding="utf-8")):
+            return False
+        # Touched but not changed, e.g. by a git checkout.
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def write_blocks(self, source: Path, blocks: dict[Path, str]) -> list[Path]:
+        """Writes the blocks extracted from a source and records them.
+
+        Blocks whose content is unchanged are not rewritten, and files this source produced
+        last time but not this time are deleted.
+
+        Args:
+            source (Path): The file the blocks were extracted from.
+            blocks (dict[Path, str]): Output file -> YAML block.
+
+        Returns:
+            list[Path]: The output files that were (re)written.
+        """
+        previous = self.sources.get(str(source), {}).get("outputs", {})
+        written = []
+        outputs = {}
+        for output, block in blocks.items():
+            block_hash = hash_text(block)
+            outputs[str(output)] = block_hash
+            if previous.get(str(output)) == block_hash and output.exists():
+                continue
+            output.parent.mkdir(parents=True, exist_ok=True)
+            with output.open("w", encoding="utf-8") as f:
+                f.write(block)
+            written.append(output)
+        for stale in set(previous) - set(outputs):
+            Path(stale).unlink(missing_ok=True)
+        self.record(source, outputs)
+        return written
+
+    def record(self, source: Path, outputs: dict[str, str]) -> None:
+        """Remembers a source as extracted, with output file -> block hash."""
+        stat = source.stat()
+        self.sources[str(source)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": hash_text(source.read_text(encoding="utf-8")),
+            "outputs": outputs,
+        }
+
+    def save(self) -> None:
+        _write_json(self.path, {"version": self.version, "sources": self.sources})
+
+
+class ValidationCache:
+    """Validation results keyed by the hash of the file name and text, for one c7n version and
+    one version of the checker, see checker_key."""
+
+    def __init__(self, path: Path, version: Optional[str] = None) -> None:
+        if version is None:
+            from c7n_make.schema import schema_key
+
+            version = f"{schema_key()}-checker-{checker_key()}"
+        self.path = path
+        self.version = version
+        saved = _read_json(path)
+        # Results from another c7n version, or another version of the checker, are all stale.
+        self.results: dict[str, tuple[bool, str]] = saved.get("results", {}) if saved.get("version") == version else {}
+
+    @staticmethod
+    def _key(file_path: Path, text: str) -> str:
+        # Some exemptions go by file name, so the name is part of the key.
+        return hash_text(f"{file_path.name}\0{text}")
+
+    def get(self, file_path: Path, text: str) -> Optional[tuple[bool, str]]:
+        """Returns the cached (ok, error) for this file name and content, or None."""
+        result = self.results.get(self._key(file_path, text))
+        return (result[0], result[1]) if result is not None else None
+
+    def put(self, file_path: Path, text: str, ok: bool, error: str) -> None:
+        self.results[self._key(file_path, text)] = (ok, error)
+
+    def save(self) -> None:
+        _write_json(self.path, {"version": self.version, "results": self.results})
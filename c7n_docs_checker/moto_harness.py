@@ -0,0 +1,279 @@
+"""Dry runs docs examples against a local moto server, fully offline.
+
+``custodian run --dry-run`` still queries the cloud for the policy's resources, so an example
+can validate and then crash at query time. This harness starts one moto server, points every
+worker at it through the AWS SDK's environment variables, and dry runs each example inside
+the workers, each with its own output directory. It records how long each example took and
+which API calls it made, which doubles as a throughput benchmark for the example policies.
+
+moto is optional: with ``moto[server]`` installed the server runs on a thread of this
+process, otherwise the ``moto_server`` command is started.
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import socket
+import subprocess
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+from c7n_docs_checker.engine import get_engine, imap_files
+
+LOGGER = logging.getLogger(__name__)
+
+# moto accepts any credentials; real ones must never reach it, or be used elsewhere.
+MOTO_ENVIRONMENT: dict[str, Optional[str]] = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_PROFILE": None,
+}
+
+DEFAULT_OUTPUT_ROOT = Path(".dry_run")
+
+
+def free_port() -> int:
+    """A TCP port nothing is listening on right now."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MotoServer:
+    """A local moto server, as a context manager.
+
+    Args:
+        port (Optional[int]): Port to listen on, a free one by default.
+        in_process (Optional[bool]): Run the server on a thread of this process. By default
+            it does when moto is importable, and runs the moto_server command otherwise.
+    """
+
+    def __init__(self, port: Optional[int] = None, in_process: Optional[bool] = None) -> None:
+        self.port = port or free_port()
+        if in_process is None:
+            try:
+                import moto.server  # noqa: F401
+
+                in_process = True
+            except ImportError:
+                in_process = False
+        self.in_process = in_process
+        self._server: Any = None
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def environment(self) -> dict[str, Optional[str]]:
+        """The environment variables that send AWS SDK calls to this server."""
+        return MOTO_ENVIRONMENT | {"AWS_ENDPOINT_URL": self.endpoint_url}
+
+    def start(self, timeout: float = 30) -> None:
+        if self.in_process:
+            from moto.server import ThreadedMotoServer
+
+            self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=self.port, verbose=False)
+            self._server.start()
+        else:
+            try:
+                self._process = subprocess.Popen(
+                    ["moto_server", "-H", "127.0.0.1", "-p", str(self.port)],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except FileNotFoundError:
+                raise RuntimeError("moto is not installed, install moto[server] to dry run examples") from None
+        self._wait_until_ready(timeout)
+        LOGGER.info(f"moto server listening on {self.endpoint_url}")
+
+    def _wait_until_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    return
+            except OSError:
+                if self._process is not None and self._process.poll() is not None:
+                    raise RuntimeError(f"moto_server exited with {self._process.returncode}")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"moto server did not start on port {self.port}")
+                time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+            self._process = None
+
+    def __enter__(self) -> "MotoServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+@contextlib.contextmanager
+def count_api_calls() -> Iterator[Counter]:
+    """Counts the AWS API calls made in this process, as "service.Operation" -> count."""
+    from botocore.client import BaseClient
+
+    calls: Counter = Counter()
+    original = BaseClient._make_api_call
+
+    def counting(client: BaseClient, operation_name: str, api_params: dict[str, Any]) -> Any:
+        calls[f"{client.meta.service_model.service_name}.{operation_name}"] += 1
+        return original(client, operation_name, api_params)
+
+    BaseClient._make_api_call = counting
+    try:
+        yield calls
+    finally:
+        BaseClient._make_api_call = original
+
+
+@contextlib.contextmanager
+def pinned_endpoint(endpoint_url: str) -> Iterator[None]:
+    """Sends every AWS client created in this process to endpoint_url, including those c7n
+    gives an explicit endpoint, like sqs and sts, which AWS_ENDPOINT_URL does not cover."""
+    from botocore.session import Session
+
+    original = Session.create_client
+
+    def create_client(session: Session, service_name: str, *args: Any, **kwargs: Any) -> Any:
+        kwargs["endpoint_url"] = endpoint_url
+        return original(session, service_name, *args, **kwargs)
+
+    Session.create_client = create_client
+    try:
+        yield
+    finally:
+        Session.create_client = original
+
+
+@dataclass(frozen=True)
+class DryRunResult:
+    """How one example's dry run went."""
+    path: Path
+    ok: bool
+    error: str
+    seconds: float
+    api_calls: dict[str, int] = field(default_factory=dict)
+
+
+def output_dir_for(file_path: Path, folder: Path, output_root: Path) -> Path:
+    """Each example's own output directory, mirroring its path under the examples folder."""
+    return output_root / file_path.relative_to(folder).with_suffix("")
+
+
+def dry_run_example(file_path: Path, folder: Path, output_root: Path) -> DryRunResult:
+    """Dry runs one example in this worker, timing it and counting its API calls.
+
+    Args:
+        file_path (Path): The example.
+        folder (Path): The examples folder, to name the output directory.
+        output_root (Path): Where the examples' output directories go.
+
+    Returns:
+        DryRunResult: The outcome.
+    """
+    LOGGER.info(f"Dry running {file_path}...")
+    output_dir = output_dir_for(file_path, folder, output_root)
+    endpoint_url = os.environ.get("AWS_ENDPOINT_URL")
+    start = time.perf_counter()
+    with count_api_calls() as calls, pinned_endpoint(endpoint_url) if endpoint_url else contextlib.nullcontext():
+        # Caching would share one cache file between every worker.
+        _, ok, error = get_engine().dry_run_file(file_path, output_dir=str(output_dir), args=["--cache-period=0"])
+    return DryRunResult(file_path, ok, error, time.perf_counter() - start, dict(calls))
+
+
+def dry_run_examples(files: List[Path], folder: Path, output_root: Path = DEFAULT_OUTPUT_ROOT,
+                     processes: Optional[int] = None) -> List[DryRunResult]:
+    """Dry runs examples on a pool of workers, all pointed at one local moto server.
+
+    Args:
+        files (List[Path]): The examples.
+        folder (Path): The folder they were collected from.
+        output_root (Path): Where each example's output directory goes.
+        processes (Optional[int]): Number of worker processes, defaults to the CPU count.
+
+    Returns:
+        List[DryRunResult]: One result per example, sorted by path.
+    """
+    results = []
+    with MotoServer() as server:
+        func = functools.partial(dry_run_example, folder=folder, output_root=output_root)
+        for result in imap_files(func, files, processes, environment=server.environment):
+            # Report as files finish, rather than all at once at the end.
+            if not result.ok:
+                LOGGER.warning(f"Failed: {result.path}")
+            results.append(result)
+    return sorted(results, key=lambda result: result.path)
+
+
+def summarize(results: List[DryRunResult], seconds: float) -> dict[str, Any]:
+    """Totals for a run that took the given wall clock time."""
+    api_calls: Counter = Counter()
+    for result in results:
+        api_calls.update(result.api_calls)
+    return {
+        "examples": len(results),
+        "failed": sum(not result.ok for result in results),
+        "seconds": seconds,
+        "examples_per_second": len(results) / seconds if seconds else 0.0,
+        "api_calls": sum(api_calls.values()),
+        "api_calls_by_operation": dict(api_calls.most_common()),
+    }
+
+
+def write_report(results: List[DryRunResult], seconds: float, report_path: Path) -> None:
+    """Writes the per example results and the run's totals as JSON."""
+    report = {
+        "summary": summarize(results, seconds),
+        "results": [asdict(result) | {"path": str(result.path)} for result in results],
+    }
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dry run docs examples against a local moto server.")
+    parser.add_argument("folder", nargs="?", default="examples", type=Path, help="Folder of YAML examples.")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes, defaults to the CPU count.")
+    parser.add_argument("--output-root", type=Path, default=DEFAULT_OUTPUT_ROOT,
+                        help="Where each example's custodian output goes.")
+    parser.add_argument("--report", type=Path, default=Path("dry_run_report.json"), help="JSON report to write.")
+    args = parser.parse_args(argv)
+
+    files = list(args.folder.rglob("*.yml")) + list(args.folder.rglob("*.yaml"))
+    LOGGER.info(f"Found {len(files)} YAML file(s) to dry run.")
+    start = time.perf_counter()
+    results = dry_run_examples(files, args.folder, args.output_root, args.jobs)
+    seconds = time.perf_counter() - start
+    write_report(results, seconds, args.report)
+
+    summary = summarize(results, seconds)
+    LOGGER.info(f"{summary['examples']} example(s) in {seconds:.1f}s, {summary['examples_per_second']:.2f}/s, "
+                f"{summary['api_calls']} API call(s), {summary['failed']} failed. Report: {args.report}")
+    for result in results:
+        if not result.ok:
+            LOGGER.error(f"File: {result.path}")
+            LOGGER.error(f"Error: {result.error}")
+            LOGGER.error("-" * 40)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""Finds the ``.. code-block:: yaml`` blocks in reStructuredText.
+
+Building a docutils document tree parses every role, directive and inline markup just to
+find a few literal blocks, and prints warnings for docstrings that are not full RST
+documents. The line scanner here finds the blocks in one pass over the lines, the way
+docutils would, and gives up on anything it does not model: code blocks nested in other
+constructs, directive options, includes, and so on. Those documents are parsed with
+docutils instead, with its warnings turned off.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from docutils.core import publish_doctree
+from docutils.nodes import literal_block
+
+from c7n_docs_checker.timing import timed
+
+LOGGER = logging.getLogger(__name__)
+
+# docutils expands tabs to this many columns before parsing.
+TAB_WIDTH = 8
+
+# Any line that may start a code directive, and the subset the scanner understands.
+_CODE_MARKER = re.compile(r"^(\s*)\.\.\s+(?:code|code-block|sourcecode)\s?::", re.IGNORECASE)
+_CODE_DIRECTIVE = re.compile(r"^\.\. +(?:code|code-block|sourcecode) ?::(?: +(\S+))?$", re.IGNORECASE)
+_INCLUDE = re.compile(r"^\s*\.\.\s+include\s?::", re.IGNORECASE | re.MULTILINE)
+_WHITESPACE = re.compile("[\v\f]")
+
+# Keep docutils quiet and never let it halt; highlighting does not change the block text.
+QUIET_SETTINGS = {
+    "report_level": 5,
+    "halt_level": 5,
+    "syntax_highlight": "none",
+}
+
+
+def _lines(rst_content: str) -> List[str]:
+    # The same normalisation docutils.statemachine.string2lines applies.
+    return [line.expandtabs(TAB_WIDTH).rstrip() for line in _WHITESPACE.sub(" ", rst_content).splitlines()]
+
+
+def scan_yaml_blocks(rst_content: str) -> Optional[List[str]]:
+    """Finds the YAML code blocks with a line scanner.
+
+    Args:
+        rst_content (str): The reStructuredText to scan.
+
+    Returns:
+        Optional[List[str]]: The blocks, as docutils would extract them, or None if the
+        document uses constructs the scanner does not handle.
+    """
+    if _INCLUDE.search(rst_content):
+        return None
+
+    lines = _lines(rst_content)
+    blocks = []
+    index = 0
+    previous_end = None
+    while index < len(lines):
+        line = lines[index]
+        marker = _CODE_MARKER.match(line)
+        if marker is None:
+            index += 1
+            continue
+        directive = _CODE_DIRECTIVE.match(line)
+        if marker.group(1) or directive is None:
+            # Nested in another construct, or arguments the scanner does not parse.
+            return None
+        if index > 0 and lines[index - 1] and index != previous_end:
+            # Neither a blank line nor another code block before it, so it may be part of a paragraph.
+            return None
+
+        # The directive block is every following line that is blank or indented.
+        end = index + 1
+        while end < len(lines) and (not lines[end] or lines[end][0] == " "):
+            end += 1
+        body = lines[index + 1:end]
+        if not body or body[0]:
+            # Options or more arguments, or no content at all.
+            return None
+        while body and not body[0]:
+            body.pop(0)
+        while body and not body[-1]:
+            body.pop()
+        if not body:
+            return None
+
+        if directive.group(1) == "yaml":
+            indent = min(len(body_line) - len(body_line.lstrip()) for body_line in body if body_line)
+            blocks.append("\n".join(body_line[indent:] for body_line in body))
+        index = previous_end = end
+
+    return blocks
+
+
+def doctree_yaml_blocks(rst_content: str) -> List[str]:
+    """Finds the YAML code blocks by building the full docutils document tree."""
+    doctree = publish_doctree(rst_content, settings_overrides=QUIET_SETTINGS)
+    return [node.astext() for node in doctree.findall(literal_block) if 'yaml' in node.get('classes', [])]
+
+
+def yaml_blocks_in_rst(rst_content: str) -> List[str]:
+    """Finds the YAML code blocks, with docutils only when the scanner cannot.
+
+    Args:
+        rst_content (str): The reStructuredText to search.
+
+    Returns:
+        List[str]: The text of each ``.. code-block:: yaml`` block, in document order.
+    """
+    with timed("extraction"):
+        blocks = scan_yaml_blocks(rst_content)
+    if blocks is None:
+        LOGGER.debug("Falling back to docutils for a document the scanner does not handle")
+        with timed("extraction_docutils"):
+            blocks = doctree_yaml_blocks(rst_content)
+    return blocks
@@ -0,0 +1,189 @@
+"""Per stage timings for the docs checker.
+
+The pipeline's stages are wrapped in ``timed(stage)``, which costs next to nothing until a
+``recording()`` block turns timing on for this process. Each sample is attributed to the
+example being checked at the time, so the report can show both where time goes by stage
+and which examples are slowest. Pool workers record with ``recorded`` and send their
+samples back with their results, for the parent to merge with ``add_samples``; what a
+worker records while it starts up is sent with its first result.
+"""
+import contextlib
+import math
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+A = TypeVar("A")
+
+# stage -> [(example, seconds)]
+Samples = dict[str, list[tuple[str, float]]]
+
+_RECORDER: Optional["StageTimings"] = None
+
+# Samples taken in a worker outside of any call, e.g. while the pool starts it.
+_PENDING: Samples = {}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """The nearest rank percentile of some values, 0.0 if there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class StageTimings:
+    """Seconds spent per stage, per example."""
+
+    def __init__(self) -> None:
+        self.samples: Samples = defaultdict(list)
+        self.current = ""
+
+    def add(self, stage: str, seconds: float, example: Optional[str] = None) -> None:
+        self.samples[stage].append((self.current if example is None else example, seconds))
+
+    def merge(self, samples: Samples) -> None:
+        """Adds samples recorded elsewhere, e.g. in a pool worker."""
+        for stage, taken in samples.items():
+            self.samples[stage].extend(taken)
+
+    @contextlib.contextmanager
+    def example(self, name: str) -> Iterator[None]:
+        """Attributes the samples taken inside the block to the named example."""
+        previous, self.current = self.current, name
+        try:
+            yield
+        finally:
+            self.current = previous
+
+    def report(self, slowest: int = 10) -> dict[str, Any]:
+        """Aggregates the samples.
+
+        Args:
+            slowest (int): How many of the slowest examples to list.
+
+        Returns:
+            dict[str, Any]: count, total, p50, p95 and max seconds per stage, and the
+            slowest examples with their time per stage.
+        """
+        stages = {}
+        per_example: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for stage, samples in self.samples.items():
+            seconds = [sample for _, sample in samples]
+            stages[stage] = {
+                "count": len(seconds),
+                "total": sum(seconds),
+                "p50": percentile(seconds, 50),
+                "p95": percentile(seconds, 95),
+                "max": max(seconds),
+            }
+            for example, sample in samples:
+                # Samples outside of any example, like start up, only count towards their stage.
+                if example:
+                    per_example[example][stage] += sample
+        ranked = sorted(per_example.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        return {
+            "stages": stages,
+            "slowest": [{"example": example, "total": sum(times.values()), "stages": dict(times)}
+                        for example, times in ranked[:slowest]],
+        }
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[StageTimings]:
+    """Turns timing on in this process for the duration of the block."""
+    global _RECORDER
+    previous, _RECORDER = _RECORDER, StageTimings()
+    try:
+        yield _RECORDER
+    finally:
+        _RECORDER = previous
+
+
+@contextlib.contextmanager
+def reporting(enabled: bool, logger: Any) -> Iterator[None]:
+    """When enabled, records the block's stage timings and logs them as a table at the end."""
+    if not enabled:
+        yield
+        return
+    with recording() as timings:
+        yield
+    logger.info("Stage timings:\n%s", format_table(timings.report()))
+
+
+@contextlib.contextmanager
+def example(name: str) -> Iterator[None]:
+    """Attributes the samples taken inside the block to the named example, when recording."""
+    recorder = _RECORDER
+    if recorder is None:
+        yield
+        return
+    with recorder.example(name):
+        yield
+
+
+def apportion(stage: str, seconds: float, shares: dict[str, int]) -> None:
+    """Records one sample of a stage that ran over several examples at once, split between
+    them in proportion to their shares, e.g. their number of policies."""
+    recorder = _RECORDER
+    total = sum(shares.values())
+    if recorder is None or not total:
+        return
+    for name, share in shares.items():
+        recorder.add(stage, seconds * share / total, example=name)
+
+
+def hold(samples: Samples) -> None:
+    """Keeps samples a worker took outside of recorded, to send with its next result."""
+    for stage, taken in samples.items():
+        _PENDING.setdefault(stage, []).extend(taken)
+
+
+def add_samples(samples: Samples) -> None:
+    """Merges samples from a pool worker into this process's recording, if there is one."""
+    if _RECORDER is not None:
+        _RECORDER.merge(samples)
+
+
+def recorded(func: Callable[[A], T], item: A) -> tuple[T, Samples]:
+    """Calls func(item) with timing on, for a pool worker, returning the result and the samples.
+
+    Samples are attributed to item when it is a single file; functions given a batch attribute
+    their own samples with example.
+    """
+    with recording() as timings:
+        timings.merge(_PENDING)
+        _PENDING.clear()
+        with timings.example(str(item)) if isinstance(item, Path) else contextlib.nullcontext():
+            result = func(item)
+    return result, dict(timings.samples)
+
+
+@contextlib.contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Times the block as one sample of the stage, when recording."""
+    recorder = _RECORDER
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(stage, time.perf_counter() - start)
+
+
+def format_table(report: dict[str, Any]) -> str:
+    """The report as a plain text table, times in milliseconds."""
+    lines = [f"{'stage':<20} {'count':>7} {'total':>10} {'p50':>9} {'p95':>9} {'max':>9}"]
+    for stage, stats in sorted(report["stages"].items(), key=lambda item: item[1]["total"], reverse=True):
+        lines.append(f"{stage:<20} {stats['count']:>7} {stats['total'] * 1000:>10.1f} "
+                     f"{stats['p50'] * 1000:>9.2f} {stats['p95'] * 1000:>9.2f} {stats['max'] * 1000:>9.2f}")
+    if report["slowest"]:
+        lines.append("")
+        lines.append("slowest examples (ms):")
+        for entry in report["slowest"]:
+            lines.append(f"{entry['total'] * 1000:>10.1f}  {entry['example']}")
+    return "\n".join(lines)
@@ -0,0 +1,44 @@
+"""Lint findings, kept apart from the engine so caches and workers share one definition."""
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+SEVERITIES = ("info", "warning", "error")
+
+
+@dataclass(frozen=True)
+class Finding:
+    """A single rule violation.
+
+    Lines and columns are 1 based, None when a rule cannot point at a location.
+    """
+
+    rule: str
+    message: str
+    policy: Optional[str] = None
+    file: Optional[str] = None
+    line: Optional[int] = None
+    column: Optional[int] = None
+    severity: str = "warning"
+
+
+@dataclass
+class LintResults:
+    """Findings of a lint run, grouped by file."""
+
+    files: dict[str, list[Finding]] = field(default_factory=dict)
+
+    def add(self, file: str, findings: list[Finding]) -> None:
+        """Records the findings of one file, a file with no findings still counts as linted."""
+        self.files.setdefault(file, []).extend(findings)
+
+    def __iter__(self) -> Iterator[Finding]:
+        for findings in self.files.values():
+            yield from findings
+
+    def __len__(self) -> int:
+        return sum(len(findings) for findings in self.files.values())
+
+    def exit_code(self, fail_on: str = "warning") -> int:
+        """Returns 1 if any finding is at least as severe as fail_on, otherwise 0."""
+        threshold = SEVERITIES.index(fail_on)
+        return int(any(SEVERITIES.index(finding.severity) >= threshold for finding in self))
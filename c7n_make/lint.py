@@ -1,10 +1,23 @@
+import glob
+import multiprocessing
+import os
+import re
 import sys
 import yaml
 import logging
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any, Union, Optional
+from typing import TYPE_CHECKING, Any, Iterator, TextIO, Union, Optional
 import tomlkit
 
+from c7n_make.findings import SEVERITIES, Finding, LintResults
+from c7n_make.lint_registry import LintRule, enabled_rules, needs_documents
+from c7n_make.yaml_loading import SafeLoader, safe_load_all
+
+if TYPE_CHECKING:
+    from c7n_make.lint_cache import LintCache
+    from c7n_make.policy_index import PolicyIndex
+
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -15,7 +28,7 @@ YamlContent = Union[dict[str, Any], list[Any]]
 def load_yaml_content(input_data: str) -> list[YamlContent]:
     """Parses YAML content, potentially with multiple documents."""
     try:
-        return list(yaml.safe_load_all(input_data))
+        return list(safe_load_all(input_data))
     except yaml.YAMLError as e:
         LOGGER.error("Error parsing YAML: %s", e)
         sys.exit(1)
@@ -32,86 +45,241 @@ def load_config(config_path: Path) -> dict[str, bool]:
     """
     try:
         with config_path.open("r", encoding="utf-8") as f:
-            config = tomlkit.parse(f.read())
+            config = tomlkit.parse(f.read()).unwrap()
         return config.get("rules", {})
     except (FileNotFoundError, tomlkit.exceptions.ParseError) as e:
         LOGGER.error("Error loading config file: %s", e)
         sys.exit(1)
 
 
-def lint_require_description(content: YamlContent) -> bool:
-    """Check if each policy has a description."""
-    for policy in content.get("policies", []):
-        if "description" not in policy:
-            LOGGER.warning("Policy %s is missing a description.", policy.get("name"))
-            return False
-    return True
+@dataclass
+class LintContext:
+    """Everything the rules need to know about one file, computed in a single pass.
 
+    The text facts are gathered by feed(), a line at a time, so the same context can be
+    filled from a whole string or incrementally while a stream is being parsed.
+
+    Attributes:
+        text (str): The raw YAML text, empty when streaming.
+        comments (list[tuple[int, str]]): Zero based line number and text of each comment.
+        documents (list[YamlContent]): The parsed YAML documents, empty when streaming.
+        nodes (dict[int, yaml.Node]): The composed node tree each document was constructed
+            from, keyed by id of the document, used to locate findings without a second parse.
+    """
 
-def lint_allowed_actions(content: YamlContent, allowed_actions: list[str]) -> bool:
-    """Check if policy actions are restricted to allowed ones (e.g., tag or notify)."""
-    valid = True
-    for policy in content.get("policies", []):
-        for action in policy.get("actions", []):
-            if action not in allowed_actions:
-                LOGGER.warning("Policy %s uses forbidden action: %s", policy.get("name"), action)
-                valid = False
-    return valid
+    text: str
+    comments: list[tuple[int, str]] = field(default_factory=list)
+    documents: list[YamlContent] = field(default_factory=list)
+    first_line: str = ""
+    first_line_number: int = 0
+    parse_error: Optional[yaml.YAMLError] = None
+    nodes: dict[int, yaml.Node] = field(default_factory=dict)
+    _pending: str = ""
+    _line_number: int = 0
+
+    def feed(self, chunk: str) -> None:
+        """Scans more text, carrying a partial last line over to the next call."""
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._scan_line(line + "\n")
+
+    def finish(self) -> None:
+        """Scans whatever is left after the last newline."""
+        if self._pending:
+            self._scan_line(self._pending)
+            self._pending = ""
+
+    def locate(self, document: Any, path: tuple[Union[str, int], ...]) -> tuple[Optional[int], Optional[int]]:
+        """Returns the 1 based line and column of the value at path inside a document.
+
+        When the path does not fully resolve, the position of the deepest node found is returned.
+        """
+        node = self.nodes.get(id(document))
+        if node is None:
+            return None, None
+        for key in path:
+            child = None
+            if isinstance(node, yaml.MappingNode):
+                child = next((value for name, value in node.value if name.value == key), None)
+            elif isinstance(node, yaml.SequenceNode) and isinstance(key, int) and key < len(node.value):
+                child = node.value[key]
+            if child is None:
+                break
+            node = child
+        return node.start_mark.line + 1, node.start_mark.column + 1
+
+    def _scan_line(self, line: str) -> None:
+        if not self.first_line and line.strip():
+            self.first_line = line.strip()
+            self.first_line_number = self._line_number
+        if "#" in line:
+            match = _COMMENT.search(line.rstrip("\r\n"))
+            if match:
+                self.comments.append((self._line_number, match.group(1)))
+        self._line_number += 1
+
+
+_COMMENT = re.compile(r"(?:^|\s)(#.*)$")
+
+
+def build_context(input_data: str, parse: bool = True) -> LintContext:
+    """Tokenize and parse the YAML text once, for use by every rule.
 
+    Args:
+        input_data (str): YAML content as a string.
+        parse (bool): Parse the documents, not needed when only text rules are enabled.
 
-def lint_require_document_separator(input_data: str) -> bool:
-    """Ensure YAML document starts with `---`."""
-    if not input_data.strip().startswith("---"):
-        LOGGER.warning("YAML document does not start with '---'.")
-        return False
-    return True
+    Returns:
+        LintContext: The shared lint context.
+    """
+    context = LintContext(text=input_data)
+    context.feed(input_data)
+    context.finish()
+    if not parse:
+        return context
+    loader = SafeLoader(input_data)
+    try:
+        context.documents = list(_load_documents(loader, context))
+    except yaml.YAMLError as e:
+        context.parse_error = e
+    finally:
+        loader.dispose()
+    return context
 
 
-def lint_require_comments(input_data: str) -> bool:
-    """Check if YAML contains any comments."""
-    if "#" not in input_data:
-        LOGGER.warning("No comments found in YAML document.")
-        return False
-    return True
+def _load_documents(loader: yaml.BaseLoader, context: LintContext, keep_nodes: bool = True) -> Iterator[Any]:
+    """Composes each document's node tree and constructs the document from it.
 
+    The node tree is kept on the context, so findings can be located without parsing again.
+    """
+    while loader.check_node():
+        node = loader.get_node()
+        document = loader.construct_document(node)
+        if not keep_nodes:
+            context.nodes.clear()
+        context.nodes[id(document)] = node
+        yield document
 
-def lint_require_version_comment(input_data: str) -> bool:
-    """Check if a Cloud Custodian version comment is present."""
-    if "# Cloud Custodian version" not in input_data:
-        LOGGER.warning("No Cloud Custodian version comment found.")
-        return False
-    return True
 
+def _syntax_error(error: yaml.YAMLError) -> Finding:
+    mark = getattr(error, "problem_mark", None)
+    return Finding("yaml_syntax", f"Error parsing YAML: {error}",
+                   line=mark.line + 1 if mark else None, column=mark.column + 1 if mark else None,
+                   severity="error")
 
-def lint_cloud_custodian_file(input_data: str, config_path: Optional[Path] = None) -> None:
-    """Lint a Cloud Custodian YAML configuration file.
 
-    Args:
-        input_data (str): YAML content as a string.
-        config_path (Optional[Path]): Path to a config file for enabled rules.
-    """
-    config = load_config(config_path) if config_path else {}
+def run_rules(context: LintContext, config: dict[str, Any],
+              rules: Optional[list[LintRule]] = None) -> list[Finding]:
+    """Run every enabled rule over an already built context.
 
-    # Parse YAML content
-    yaml_documents = load_yaml_content(input_data)
+    File level rules run once per file, document level rules once per document.
 
-    # Apply rules based on configuration
-    for doc in yaml_documents:
-        if config.get("require_description", True):
-            lint_require_description(doc)
+    Args:
+        context (LintContext): The shared lint context.
+        config (dict[str, Any]): Rule configuration, see c7n_make.lint_registry.enabled_rules.
+        rules (Optional[list[LintRule]]): The enabled rules, when the caller already looked them up.
+
+    Returns:
+        list[Finding]: Everything the rules found.
+    """
+    if context.parse_error:
+        return [_syntax_error(context.parse_error)]
+    rules = enabled_rules(config) if rules is None else rules
+    findings: list[Finding] = []
+    document_rules = [lint_rule for lint_rule in rules if lint_rule.per_document]
+    for doc in context.documents:
+        if not isinstance(doc, dict):
+            continue
+        for lint_rule in document_rules:
+            findings.extend(lint_rule.check(context, doc, config))
+    for lint_rule in rules:
+        if not lint_rule.per_document:
+            findings.extend(lint_rule.check(context, config))
+    return findings
+
+
+class _ScanningReader:
+    """A read-only file wrapper that shows every chunk the YAML parser reads to the lint context."""
+
+    def __init__(self, stream: TextIO, context: LintContext) -> None:
+        self.stream = stream
+        self.context = context
+        self.name = getattr(stream, "name", "<file>")
+
+    def read(self, size: int = -1) -> str:
+        chunk = self.stream.read(size)
+        self.context.feed(chunk)
+        return chunk
+
+
+def lint_stream(stream: TextIO, config: dict[str, Any],
+                rules: Optional[list[LintRule]] = None, names: Optional[list[str]] = None) -> list[Finding]:
+    """Lint a YAML stream in a single pass, holding about one document in memory at a time.
+
+    Document rules run as each document is parsed and the text facts for the file rules
+    are gathered from the same reads, so the file is neither read into a string nor
+    parsed into a list of documents. The findings match those of run_rules.
 
-        if config.get("allowed_actions", True):
-            allowed_actions = config.get("allowed_actions_list", ["tag", "notify"])
-            lint_allowed_actions(doc, allowed_actions)
+    Args:
+        stream (TextIO): An open text file handle.
+        config (dict[str, Any]): Rule configuration, see c7n_make.lint_registry.enabled_rules.
+        rules (Optional[list[LintRule]]): The enabled rules, when the caller already looked them up.
+        names (Optional[list[str]]): When given, the name of every policy is added to it, for the
+            collection level rules, see c7n_make.policy_index. None are added if the file does not parse.
 
-        if config.get("require_document_separator", True):
-            lint_require_document_separator(input_data)
+    Returns:
+        list[Finding]: Everything the rules found.
+    """
+    from c7n_make.policy_index import document_policy_names
+
+    rules = enabled_rules(config) if rules is None else rules
+    context = LintContext(text="")
+    findings: list[Finding] = []
+    document_rules = [lint_rule for lint_rule in rules if lint_rule.per_document]
+    reader = _ScanningReader(stream, context)
+    if document_rules or names is not None:
+        loader = SafeLoader(reader)
+        found: list[str] = []
+        try:
+            for doc in _load_documents(loader, context, keep_nodes=False):
+                if not isinstance(doc, dict):
+                    continue
+                found.extend(document_policy_names(doc))
+                for lint_rule in document_rules:
+                    findings.extend(lint_rule.check(context, doc, config))
+        except yaml.YAMLError as e:
+            return [_syntax_error(e)]
+        finally:
+            loader.dispose()
+        if names is not None:
+            names.extend(found)
+    else:
+        while reader.read(1 << 16):
+            pass
+    context.finish()
+    for lint_rule in rules:
+        if not lint_rule.per_document:
+            findings.extend(lint_rule.check(context, config))
+    return findings
+
+
+def lint_cloud_custodian_file(input_data: str, config_path: Optional[Path] = None,
+                              config: Optional[dict[str, Any]] = None) -> list[Finding]:
+    """Lint a Cloud Custodian YAML configuration file.
 
-        if config.get("require_comments", True):
-            lint_require_comments(input_data)
+    Args:
+        input_data (str): YAML content as a string.
+        config_path (Optional[Path]): Path to a config file for enabled rules.
+        config (Optional[dict[str, Any]]): Already loaded rules, takes precedence over config_path.
 
-        if config.get("require_version_comment", True):
-            lint_require_version_comment(input_data)
+    Returns:
+        list[Finding]: Everything the enabled rules found.
+    """
+    if config is None:
+        config = load_config(config_path) if config_path else {}
+    rules = enabled_rules(config)
+    return run_rules(build_context(input_data, parse=needs_documents(rules)), config, rules)
 
 
 def read_input(source: Union[str, Path]) -> str:
@@ -129,14 +297,144 @@ def read_input(source: Union[str, Path]) -> str:
     return source  # Assume source is YAML content directly
 
 
+def collect_policy_files(sources: list[str]) -> list[Path]:
+    """Expands directories and glob patterns into a sorted list of policy files.
+
+    Args:
+        sources (list[str]): Files, directories or glob patterns.
+
+    Returns:
+        list[Path]: Every .yml and .yaml file found, without duplicates.
+    """
+    files: set[Path] = set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            files.update(path.rglob("*.yml"))
+            files.update(path.rglob("*.yaml"))
+        elif glob.has_magic(source):
+            files.update(Path(match) for match in glob.glob(source, recursive=True) if Path(match).is_file())
+        elif path.is_file():
+            files.add(path)
+    return sorted(files)
+
+
+_WORKER_CONFIG: dict[str, Any] = {}
+_WORKER_CACHE: Optional["LintCache"] = None
+_WORKER_STREAM = False
+_WORKER_NAMES = False
+_WORKER_RULES: list[LintRule] = []
+
+
+def _init_worker(config: dict[str, Any], cache_dir: Optional[Path], stream: bool = False,
+                 collect_names: bool = False) -> None:
+    """Receives the lint config once per worker process instead of once per file."""
+    global _WORKER_CACHE, _WORKER_STREAM, _WORKER_NAMES
+    _WORKER_STREAM = stream
+    _WORKER_NAMES = collect_names
+    _WORKER_CONFIG.clear()
+    _WORKER_CONFIG.update(config)
+    # Rule modules are imported here, once per worker.
+    _WORKER_RULES[:] = enabled_rules(config)
+    if cache_dir is None:
+        _WORKER_CACHE = None
+    else:
+        from c7n_make.lint_cache import LintCache
+
+        _WORKER_CACHE = LintCache(cache_dir, config)
+
+
+def lint_file(file_path: Path, config: dict[str, Any],
+              cache: Optional["LintCache"] = None, stream: bool = False,
+              rules: Optional[list[LintRule]] = None,
+              names: Optional[list[str]] = None) -> tuple[Path, list[Finding]]:
+    """Lints one policy file with an already loaded config.
+
+    Args:
+        file_path (Path): Path to the policy file.
+        config (dict[str, Any]): Rule configuration.
+        cache (Optional[LintCache]): Skip files whose content and config were already linted.
+        stream (bool): Lint without reading the whole file into memory, bypasses the cache.
+        rules (Optional[list[LintRule]]): The enabled rules, when the caller already looked them up.
+        names (Optional[list[str]]): When streaming, collects the policy names, see lint_stream.
+
+    Returns:
+        tuple[Path, list[Finding]]: The file path and its findings.
+    """
+    rules = enabled_rules(config) if rules is None else rules
+    if stream:
+        with file_path.open("r", encoding="utf-8") as f:
+            findings = lint_stream(f, config, rules, names)
+        return file_path, [replace(finding, file=str(file_path)) for finding in findings]
+
+    input_data = read_input(file_path)
+    findings = cache.get(input_data) if cache is not None else None
+    if findings is None:
+        findings = run_rules(build_context(input_data, parse=needs_documents(rules)), config, rules)
+        if cache is not None:
+            cache.put(input_data, findings)
+    # The cache is keyed by content, so identical files share entries; the file is stamped afterwards.
+    return file_path, [replace(finding, file=str(file_path)) for finding in findings]
+
+
+def _lint_file_in_worker(file_path: Path) -> tuple[Path, list[Finding], Optional[list[str]]]:
+    names: Optional[list[str]] = [] if _WORKER_NAMES else None
+    file_path, findings = lint_file(file_path, _WORKER_CONFIG, _WORKER_CACHE, _WORKER_STREAM, _WORKER_RULES, names)
+    return file_path, findings, names
+
+
+def lint_files_in_parallel(files: list[Path], config: dict[str, Any],
+                           processes: Optional[int] = None,
+                           cache_dir: Optional[Path] = None, stream: bool = False,
+                           index: Optional["PolicyIndex"] = None) -> LintResults:
+    """Lints policy files across a process pool sized to the CPU count.
+
+    Args:
+        files (list[Path]): Policy files to lint.
+        config (dict[str, Any]): Rule configuration, shipped to each worker once.
+        processes (Optional[int]): Number of worker processes, defaults to the CPU count.
+        cache_dir (Optional[Path]): Directory of the lint result cache, None disables caching.
+        stream (bool): Lint each file in a single bounded memory pass, see lint_stream.
+        index (Optional[PolicyIndex]): When streaming, updated with the policy names found in the
+            same pass, so the files need not be read again for the collection level rules.
+
+    Returns:
+        LintResults: Findings for every file, in the order the files were given.
+    """
+    results = LintResults()
+    collect_names = stream and index is not None
+
+    def add(file_path: Path, findings: list[Finding], names: Optional[list[str]]) -> None:
+        results.add(str(file_path), findings)
+        if index is not None and names is not None:
+            index.update(str(file_path), names)
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(files) < 2:
+        _init_worker(config, cache_dir, stream, collect_names)
+        for result in map(_lint_file_in_worker, files):
+            add(*result)
+        return results
+
+    # Several chunks per worker keeps everyone busy when some files are much larger than others.
+    chunksize = max(1, len(files) // (processes * 4))
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(config, cache_dir, stream, collect_names)) as pool:
+        for result in pool.imap(_lint_file_in_worker, files, chunksize=chunksize):
+            add(*result)
+    return results
+
+
 if __name__ == "__main__":
     # Example usage
     import argparse
 
-    parser = argparse.ArgumentParser(description="Lint a Cloud Custodian YAML file.")
+    parser = argparse.ArgumentParser(description="Lint Cloud Custodian YAML files.")
     parser.add_argument(
-        "source",
-        help="File name or YAML content. If content is piped, it will be treated as YAML directly."
+        "sources",
+        nargs="+",
+        help="File names, directories, glob patterns or YAML content. "
+             "If content is piped, it will be treated as YAML directly."
     )
     parser.add_argument(
         "--config",
@@ -144,9 +442,85 @@ if __name__ == "__main__":
         default="custodian_linter_config.toml",
         help="Path to the configuration file (default: custodian_linter_config.toml)"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes when linting many files (default: CPU count)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=".c7n_lint_cache",
+        help="Directory of the lint result cache (default: .c7n_lint_cache)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Lint every file, ignoring and not updating the lint result cache"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Lint huge multi-document files a document at a time (implies --no-cache)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "sarif", "junit"],
+        default="text",
+        help="Report format (default: text)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write the report to this file instead of stdout"
+    )
+    parser.add_argument(
+        "--fail-on",
+        choices=SEVERITIES,
+        default="warning",
+        help="Exit non-zero when a finding is at least this severe (default: warning)"
+    )
 
     args = parser.parse_args()
 
+    from c7n_make.lint_report import WRITERS
+
     config_path = Path(args.config)
-    yaml_content = read_input(args.source)
-    lint_cloud_custodian_file(yaml_content, config_path=config_path)
+    rules = load_config(config_path)
+    policy_files = collect_policy_files(args.sources)
+    if policy_files:
+        from c7n_make.policy_index import PolicyIndex, checks_collection, index_key
+
+        cache_dir = None if args.no_cache or args.stream else Path(args.cache_dir)
+        index_path = cache_dir / "policy_index.json" if cache_dir is not None else None
+        policy_index = PolicyIndex.load(index_path) if checks_collection(rules) else None
+        lint_results = lint_files_in_parallel(policy_files, rules, processes=args.jobs, cache_dir=cache_dir,
+                                              stream=args.stream, index=policy_index)
+        if policy_index is not None:
+            if not args.stream:
+                # Streaming already indexed the names; otherwise only changed files are parsed.
+                policy_index.refresh(policy_files)
+            linted = {index_key(file): str(file) for file in policy_files}
+            # Files indexed by earlier runs count towards duplicates, but are only reported when linted.
+            for file, findings in policy_index.findings(rules).items():
+                if file in linted:
+                    lint_results.add(linted[file], [replace(finding, file=linted[file]) for finding in findings])
+            if index_path is not None:
+                policy_index.save(index_path)
+        if cache_dir is not None:
+            from c7n_make.lint_cache import LintCache
+
+            LintCache(cache_dir, rules).evict()
+    else:
+        yaml_content = read_input(args.sources[0])
+        lint_results = LintResults()
+        lint_results.add("<input>", lint_cloud_custodian_file(yaml_content, config=rules))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report:
+            WRITERS[args.format](lint_results, report)
+    else:
+        WRITERS[args.format](lint_results, sys.stdout)
+    sys.exit(lint_results.exit_code(args.fail_on))
@@ -0,0 +1,110 @@
+"""On-disk cache of lint findings, so unchanged policy files are not re-parsed.
+
+Entries are keyed by the hash of the file content, the hash of the rule config and the
+linter version, so editing a file, changing a rule or upgrading the linter all miss.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Optional
+
+from c7n_make import __version__
+from c7n_make.findings import Finding
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(".c7n_lint_cache")
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_SIZE_BYTES = 64 * 1024 * 1024
+
+
+def hash_text(text: str) -> str:
+    """Returns the sha256 hex digest of some text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_config(config: dict[str, Any]) -> str:
+    """Returns a stable hash of the rule config, independent of key order."""
+    return hash_text(json.dumps(config, sort_keys=True, default=str))
+
+
+class LintCache:
+    """Stores the findings for each (content, config, linter version) combination."""
+
+    def __init__(self, cache_dir: Path, config: dict[str, Any]) -> None:
+        self.cache_dir = Path(cache_dir)
+        if config.get("schema"):
+            # Schema findings change when c7n is upgraded, even if the policy does not.
+            from c7n_make.schema import schema_key
+
+            config = dict(config, schema_key=schema_key())
+        self.config_hash = hash_config(config)
+
+    def _entry_path(self, text: str) -> Path:
+        key = hash_text(f"{__version__}:{self.config_hash}:{hash_text(text)}")
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, text: str) -> Optional[list[Finding]]:
+        """Returns the cached findings for this content, or None on a miss."""
+        entry = self._entry_path(text)
+        try:
+            with entry.open("r", encoding="utf-8") as f:
+                findings = [Finding(**item) for item in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            return None
+        # Touch the entry so size based eviction drops the least recently used first.
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return findings
+
+    def put(self, text: str, findings: list[Finding]) -> None:
+        """Stores the findings for this content."""
+        entry = self._entry_path(text)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so parallel workers never see a half written entry.
+            fd, temp_name = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump([asdict(finding) for finding in findings], f)
+            os.replace(temp_name, entry)
+        except OSError as e:
+            LOGGER.debug("Could not write lint cache entry %s: %s", entry, e)
+
+    def evict(self, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+              max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES) -> int:
+        """Deletes entries older than max_age_seconds, then the oldest until under max_size_bytes.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        if not self.cache_dir.is_dir():
+            return 0
+        now = time.time()
+        entries = []
+        for entry in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+
+        total_size = sum(size for _, size, _ in entries)
+        deleted = 0
+        for mtime, size, entry in entries:
+            if now - mtime <= max_age_seconds and total_size <= max_size_bytes:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total_size -= size
+            deleted += 1
+        return deleted
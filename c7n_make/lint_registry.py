@@ -0,0 +1,127 @@
+"""The lint rule registry.
+
+Rules register themselves with the ``rule`` decorator when their module is imported.
+Modules are only imported when one of their rules is enabled, so a rule that needs a heavy
+dependency (the c7n schema, for example) costs nothing unless it is switched on.
+
+Built in rules are listed in RuleMap, in the style of the c7n resource maps, and are
+enabled unless set to false in lint_config.toml, apart from OPT_IN_RULES. Other packages can ship rules through the
+``c7n_make.lint_rules`` entry point group, where the entry point name is the rule name and
+the value is the module that registers it::
+
+    [project.entry-points."c7n_make.lint_rules"]
+    require_owner_tag = "acme_lint.rules"
+
+Plugin rules are off unless set to true in lint_config.toml.
+"""
+import importlib
+import logging
+from dataclasses import dataclass
+from functools import cache
+from importlib.metadata import EntryPoint, entry_points
+from typing import Any, Callable, Iterable, Iterator
+
+from c7n_make.findings import Finding
+
+LOGGER = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "c7n_make.lint_rules"
+
+# What a rule can ask the engine for. Text facts are always gathered, they come from the
+# same pass that reads the file; documents are only parsed if an enabled rule needs them.
+TEXT = "text"
+DOCUMENT = "document"
+SCHEMA = "schema"
+
+# Built in rules, by the module that registers them.
+RuleMap = {
+    "require_description": "c7n_make.rules.policy",
+    "allowed_actions": "c7n_make.rules.policy",
+    "require_document_separator": "c7n_make.rules.text",
+    "require_comments": "c7n_make.rules.text",
+    "require_version_comment": "c7n_make.rules.text",
+    "schema": "c7n_make.rules.schema",
+}
+
+# Built in rules that are expensive enough to be off unless set to true.
+OPT_IN_RULES = ("schema",)
+
+# Settings that are not per file rules, see c7n_make.policy_index.
+COLLECTION_RULES = ("unique_policy_names", "policy_name_matches_file")
+
+
+@dataclass(frozen=True)
+class LintRule:
+    """A registered rule.
+
+    Rules that need DOCUMENT are called once per YAML document as check(context, document, config),
+    other rules once per file as check(context, config).
+    """
+
+    name: str
+    check: Callable[..., Iterator[Finding]]
+    needs: frozenset[str]
+
+    @property
+    def per_document(self) -> bool:
+        return DOCUMENT in self.needs
+
+
+RULES: dict[str, LintRule] = {}
+
+
+def rule(name: str, needs: Iterable[str] = (TEXT,)) -> Callable[[Callable], Callable]:
+    """Register a lint rule.
+
+    Args:
+        name (str): The rule id, also the key that enables it in lint_config.toml.
+        needs (Iterable[str]): What the rule reads, TEXT, DOCUMENT and/or SCHEMA.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        RULES[name] = LintRule(name, func, frozenset(needs))
+        return func
+
+    return decorator
+
+
+@cache
+def _plugin_entry_points() -> dict[str, EntryPoint]:
+    return {entry_point.name: entry_point for entry_point in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+def _import_rule(name: str, module: str) -> LintRule:
+    if name not in RULES:
+        importlib.import_module(module)
+    if name not in RULES:
+        raise LookupError(f"Module {module} does not register lint rule {name}")
+    return RULES[name]
+
+
+def enabled_rules(config: dict[str, Any]) -> list[LintRule]:
+    """Imports and returns the rules switched on in config.
+
+    Entry points are only looked up when config switches on a rule that is not built in.
+
+    Args:
+        config (dict[str, Any]): Rule configuration.
+
+    Returns:
+        list[LintRule]: The enabled rules, built in rules first.
+    """
+    rules = [_import_rule(name, module) for name, module in RuleMap.items()
+             if config.get(name, name not in OPT_IN_RULES)]
+    plugins = [name for name, value in config.items()
+               if value is True and name not in RuleMap and name not in COLLECTION_RULES]
+    for name in plugins:
+        entry_point = _plugin_entry_points().get(name)
+        if entry_point is None:
+            LOGGER.warning("Unknown lint rule %s in config, is the package that provides it installed?", name)
+            continue
+        rules.append(_import_rule(name, entry_point.value.split(":")[0]))
+    return rules
+
+
+def needs_documents(rules: list[LintRule]) -> bool:
+    """True if any of the rules needs the YAML to be parsed."""
+    return any(lint_rule.per_document for lint_rule in rules)
@@ -0,0 +1,91 @@
+"""Writers that turn LintResults into text, JSON, SARIF or JUnit XML reports."""
+import json
+import xml.etree.ElementTree as ET
+from dataclasses import asdict
+from typing import Callable, TextIO
+
+from c7n_make import __version__
+from c7n_make.findings import Finding, LintResults
+
+TOOL_NAME = "c7n_make-lint"
+
+
+def _location(finding: Finding) -> str:
+    location = finding.file or "<input>"
+    if finding.line is not None:
+        location += f":{finding.line}"
+        if finding.column is not None:
+            location += f":{finding.column}"
+    return location
+
+
+def write_text(results: LintResults, out: TextIO) -> None:
+    """One line per finding, in the style of compiler output, then a summary."""
+    lines = [f"{_location(finding)}: {finding.severity} [{finding.rule}] {finding.message}" for finding in results]
+    lines.append(f"Linted {len(results.files)} file(s), {len(results)} finding(s).")
+    out.write("\n".join(lines) + "\n")
+
+
+def write_json(results: LintResults, out: TextIO) -> None:
+    """A flat, sorted list of findings, stable enough to diff between runs."""
+    findings = sorted((asdict(finding) for finding in results),
+                      key=lambda item: (item["file"] or "", item["line"] or 0, item["rule"]))
+    json.dump({"version": __version__, "files": len(results.files), "findings": findings}, out, indent=2)
+    out.write("\n")
+
+
+_SARIF_LEVELS = {"error": "error", "warning": "warning", "info": "note"}
+
+
+def write_sarif(results: LintResults, out: TextIO) -> None:
+    """SARIF 2.1.0, for code scanning dashboards."""
+    sarif_results = []
+    for finding in results:
+        region = {}
+        if finding.line is not None:
+            region["startLine"] = finding.line
+            if finding.column is not None:
+                region["startColumn"] = finding.column
+        physical_location = {"artifactLocation": {"uri": (finding.file or "<input>").replace("\\", "/")}}
+        if region:
+            physical_location["region"] = region
+        sarif_results.append({
+            "ruleId": finding.rule,
+            "level": _SARIF_LEVELS.get(finding.severity, "warning"),
+            "message": {"text": finding.message},
+            "locations": [{"physicalLocation": physical_location}],
+        })
+    rule_ids = sorted({finding.rule for finding in results})
+    sarif = {
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "version": "2.1.0",
+        "runs": [{
+            "tool": {"driver": {"name": TOOL_NAME, "version": __version__,
+                                "rules": [{"id": rule_id} for rule_id in rule_ids]}},
+            "results": sarif_results,
+        }],
+    }
+    json.dump(sarif, out, indent=2)
+    out.write("\n")
+
+
+def write_junit(results: LintResults, out: TextIO) -> None:
+    """One test case per file, failing when the file has findings."""
+    suite = ET.Element("testsuite", name=TOOL_NAME, tests=str(len(results.files)),
+                       failures=str(sum(1 for findings in results.files.values() if findings)))
+    for file, findings in results.files.items():
+        case = ET.SubElement(suite, "testcase", classname=TOOL_NAME, name=file)
+        if findings:
+            failure = ET.SubElement(case, "failure", message=f"{len(findings)} finding(s)")
+            failure.text = "\n".join(f"{_location(finding)}: {finding.severity} [{finding.rule}] {finding.message}"
+                                     for finding in findings)
+    out.write(ET.tostring(suite, encoding="unicode", xml_declaration=True))
+    out.write("\n")
+
+
+WRITERS: dict[str, Callable[[LintResults, TextIO], None]] = {
+    "text": write_text,
+    "json": write_json,
+    "sarif": write_sarif,
+    "junit": write_junit,
+}
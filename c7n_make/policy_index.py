@@ -0,0 +1,194 @@
+"""Collection level checks that need to see every policy file at once.
+
+Duplicate policy names silently overwrite each other's output directories when run with
+``custodian run -s out``, and the README asks for one policy per file named after the
+policy. Both are checked with a single name -> files index rather than by comparing
+files pairwise. The index can be saved and refreshed, so only changed files are parsed.
+
+Files are indexed by their resolved path, so the same file reached through different
+relative or absolute paths is one entry.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+from c7n_make.findings import Finding
+from c7n_make.lint_cache import hash_text
+from c7n_make.lint_registry import COLLECTION_RULES
+from c7n_make.yaml_loading import safe_load_all
+
+LOGGER = logging.getLogger(__name__)
+
+
+def document_policy_names(document: Any) -> list[str]:
+    """Returns the name of every policy in one parsed document."""
+    if not isinstance(document, dict):
+        return []
+    policies = document.get("policies", None) or []
+    if not isinstance(policies, list):
+        return []
+    return [policy["name"] for policy in policies if isinstance(policy, dict) and isinstance(policy.get("name"), str)]
+
+
+def policy_names(input_data: str) -> list[str]:
+    """Returns the name of every policy in every document of a policy file."""
+    names = []
+    for document in safe_load_all(input_data):
+        names.extend(document_policy_names(document))
+    return names
+
+
+def checks_collection(config: dict[str, Any]) -> bool:
+    """Whether any collection level rule is enabled, they are unless set to false."""
+    return any(config.get(name, True) for name in COLLECTION_RULES)
+
+
+def index_key(path: Any) -> str:
+    """The index's name for a file, its resolved path."""
+    return str(Path(path).resolve())
+
+
+def _stamp(stat: os.stat_result) -> str:
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _display(file: str) -> str:
+    """A file's path relative to the working directory when it is under it, for messages."""
+    try:
+        return str(Path(file).relative_to(Path.cwd()))
+    except ValueError:
+        return file
+
+
+@dataclass
+class PolicyIndex:
+    """An index of policy name -> files, with the content hash, size and mtime each file was
+    indexed at."""
+
+    names: dict[str, set[str]] = field(default_factory=dict)
+    files: dict[str, tuple[str, list[str], str]] = field(default_factory=dict)
+
+    def update(self, file: str, names: list[str], digest: str = "", stamp: str = "") -> None:
+        """Replaces whatever the index knew about a file.
+
+        Args:
+            file (str): The file, resolved by index_key.
+            names (list[str]): Its policy names.
+            digest (str): Hash of its content, empty if unknown.
+            stamp (str): Its size and mtime, empty if unknown, so the next refresh checks it.
+        """
+        file = index_key(file)
+        self.remove(file)
+        self.files[file] = (digest, names, stamp)
+        for name in names:
+            self.names.setdefault(name, set()).add(file)
+
+    def remove(self, file: str) -> None:
+        """Forgets a file, for example because it was deleted."""
+        _, names, _ = self.files.pop(file, ("", [], ""))
+        for name in names:
+            files = self.names.get(name)
+            if files is None:
+                continue
+            files.discard(file)
+            if not files:
+                del self.names[name]
+
+    def refresh(self, paths: list[Path]) -> int:
+        """Brings the index up to date with the given files, parsing only those that changed.
+
+        Files indexed by earlier runs are kept, so a run over just the changed files still
+        sees the names in the others. Every entry is checked against its file's size and
+        mtime, and content hash when those changed, and re-parsed or dropped as needed.
+
+        Returns:
+            int: How many files were parsed.
+        """
+        wanted = {index_key(path) for path in paths}
+        parsed = 0
+        for file in sorted(set(self.files) | wanted):
+            path = Path(file)
+            try:
+                stamp = _stamp(path.stat())
+                known = self.files.get(file)
+                if known is not None and known[2] == stamp:
+                    continue
+                input_data = path.read_text(encoding="utf-8")
+            except OSError as e:
+                if file in wanted:
+                    LOGGER.warning("Could not read %s: %s", path, e)
+                self.remove(file)
+                continue
+            digest = hash_text(input_data)
+            if known is not None and known[0] == digest:
+                # Touched but not changed
+                self.files[file] = (digest, known[1], stamp)
+                continue
+            try:
+                names = policy_names(input_data)
+            except yaml.YAMLError:
+                # The per-file lint already reports syntax errors.
+                names = []
+            self.update(file, names, digest, stamp)
+            parsed += 1
+        return parsed
+
+    def duplicates(self) -> dict[str, list[str]]:
+        """Returns each policy name defined in more than one place, with the files defining it."""
+        duplicated = {}
+        for name, files in self.names.items():
+            occurrences = sum(self.files[file][1].count(name) for file in files)
+            if occurrences > 1:
+                duplicated[name] = sorted(files)
+        return duplicated
+
+    def mismatches(self) -> dict[str, str]:
+        """Returns file -> policy name for single policy files not named after their policy."""
+        return {file: names[0] for file, (_, names, _) in self.files.items()
+                if len(names) == 1 and Path(file).stem != names[0]}
+
+    def findings(self, config: dict[str, Any]) -> dict[str, list[Finding]]:
+        """Returns the collection level findings, grouped by file, as index_key names it.
+
+        Args:
+            config (dict[str, Any]): Rule configuration, rules are enabled unless set to false.
+        """
+        found: dict[str, list[Finding]] = {}
+        if config.get("unique_policy_names", True):
+            for name, files in self.duplicates().items():
+                message = f"Policy name {name} is defined more than once: {', '.join(map(_display, files))}"
+                for file in files:
+                    found.setdefault(file, []).append(
+                        Finding("unique_policy_names", message, name, file, severity="error"))
+        if config.get("policy_name_matches_file", True):
+            for file, name in self.mismatches().items():
+                found.setdefault(file, []).append(
+                    Finding("policy_name_matches_file", f"File name does not match policy name {name}.", name, file))
+        return found
+
+    def save(self, path: Path) -> None:
+        """Writes the index, so the next refresh only parses changed files."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump({file: {"digest": digest, "names": names, "stamp": stamp}
+                       for file, (digest, names, stamp) in self.files.items()}, f)
+
+    @classmethod
+    def load(cls, path: Optional[Path]) -> "PolicyIndex":
+        """Reads a saved index, or returns an empty one if there is none."""
+        index = cls()
+        if path is None:
+            return index
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return index
+        for file, entry in saved.items():
+            index.update(file, entry["names"], entry["digest"], entry.get("stamp", ""))
+        return index
@@ -0,0 +1,45 @@
+"""Rules that look at the policies in each YAML document."""
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from c7n_make.findings import Finding
+from c7n_make.lint_registry import DOCUMENT, rule
+
+if TYPE_CHECKING:
+    from c7n_make.lint import LintContext
+
+
+def _policy_name(policy: Any) -> Optional[str]:
+    return policy.get("name") if isinstance(policy, dict) else None
+
+
+def _action_name(action: Any) -> Any:
+    return action.get("type") if isinstance(action, dict) else action
+
+
+@rule("require_description", needs=(DOCUMENT,))
+def lint_require_description(context: "LintContext", content: dict[str, Any],
+                             config: dict[str, Any]) -> Iterator[Finding]:
+    """Check if each policy has a description."""
+    for index, policy in enumerate(content.get("policies", [])):
+        if isinstance(policy, dict) and "description" not in policy:
+            name = _policy_name(policy)
+            line, column = context.locate(content, ("policies", index))
+            yield Finding("require_description", f"Policy {name} is missing a description.", name,
+                          line=line, column=column)
+
+
+@rule("allowed_actions", needs=(DOCUMENT,))
+def lint_allowed_actions(context: "LintContext", content: dict[str, Any],
+                         config: dict[str, Any]) -> Iterator[Finding]:
+    """Check if policy actions are restricted to allowed ones (e.g., tag or notify)."""
+    allowed_actions = config.get("allowed_actions_list", ["tag", "notify"])
+    for index, policy in enumerate(content.get("policies", [])):
+        if not isinstance(policy, dict):
+            continue
+        name = _policy_name(policy)
+        for action_index, action in enumerate(policy.get("actions", [])):
+            action_name = _action_name(action)
+            if action_name not in allowed_actions:
+                line, column = context.locate(content, ("policies", index, "actions", action_index))
+                yield Finding("allowed_actions", f"Policy {name} uses forbidden action: {action_name}", name,
+                              line=line, column=column)
@@ -0,0 +1,24 @@
+"""Validates each document against the c7n policy schema, see c7n_make.schema."""
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+from c7n_make import schema
+from c7n_make.findings import Finding
+from c7n_make.lint_registry import DOCUMENT, SCHEMA, rule
+
+if TYPE_CHECKING:
+    from c7n_make.lint import LintContext
+
+
+@rule("schema", needs=(DOCUMENT, SCHEMA))
+def lint_schema(context: "LintContext", content: dict[str, Any], config: dict[str, Any]) -> Iterator[Finding]:
+    """Check the document against the c7n schema, including awsx resources."""
+    schema_dir = Path(config.get("schema_cache_dir", schema.DEFAULT_SCHEMA_DIR))
+    for error in schema.iter_errors(content, schema_dir):
+        path = tuple(error.absolute_path)
+        name = None
+        if len(path) >= 2 and path[0] == "policies" and isinstance(path[1], int):
+            policy = content["policies"][path[1]]
+            name = policy.get("name") if isinstance(policy, dict) else None
+        line, column = context.locate(content, path)
+        yield Finding("schema", error.message, name, line=line, column=column, severity="error")
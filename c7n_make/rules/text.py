@@ -0,0 +1,30 @@
+"""Rules that only look at the raw text, they run without parsing the YAML."""
+from typing import TYPE_CHECKING, Any, Iterator
+
+from c7n_make.findings import Finding
+from c7n_make.lint_registry import TEXT, rule
+
+if TYPE_CHECKING:
+    from c7n_make.lint import LintContext
+
+
+@rule("require_document_separator", needs=(TEXT,))
+def lint_require_document_separator(context: "LintContext", config: dict[str, Any]) -> Iterator[Finding]:
+    """Ensure YAML document starts with `---`."""
+    if not context.first_line.startswith("---"):
+        yield Finding("require_document_separator", "YAML document does not start with '---'.",
+                      line=context.first_line_number + 1, column=1)
+
+
+@rule("require_comments", needs=(TEXT,))
+def lint_require_comments(context: "LintContext", config: dict[str, Any]) -> Iterator[Finding]:
+    """Check if YAML contains any comments."""
+    if not context.comments:
+        yield Finding("require_comments", "No comments found in YAML document.")
+
+
+@rule("require_version_comment", needs=(TEXT,))
+def lint_require_version_comment(context: "LintContext", config: dict[str, Any]) -> Iterator[Finding]:
+    """Check if a Cloud Custodian version comment is present."""
+    if not any("# Cloud Custodian version" in comment for _, comment in context.comments):
+        yield Finding("require_version_comment", "No Cloud Custodian version comment found.")
@@ -0,0 +1,193 @@
+"""The c7n policy schema, generated once and cached on disk by c7n version.
+
+Generating the schema means importing every resource module of every installed provider,
+which takes seconds. The generated schema is plain JSON, so it is saved the first time and
+later runs (and every pool worker) only read it back and compile a validator.
+
+The schema includes the ``awsx`` provider from aws_extras. It is kept outside the lint result
+cache, whose eviction would otherwise delete it.
+"""
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import logging
+import os
+import tempfile
+from functools import cache
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_DIR = Path(".c7n_schema_cache")
+
+# Provider name -> the package that provides it, as imported by c7n.resources.load_providers
+PROVIDER_PACKAGES = {
+    "aws": "c7n",
+    "awscc": "c7n_awscc",
+    "azure": "c7n_azure",
+    "gcp": "c7n_gcp",
+    "k8s": "c7n_kube",
+    "openstack": "c7n_openstack",
+    "terraform": "c7n_left",
+    "tencentcloud": "c7n_tencentcloud",
+    "oci": "c7n_oci",
+}
+
+
+def load_providers() -> list[str]:
+    """Imports every installed c7n provider and its resources, plus the awsx extension.
+
+    Returns:
+        list[str]: The names of the loaded providers.
+    """
+    import c7n.resources
+
+    # Registers the awsx cloud, c7n cannot discover providers it does not know in advance.
+    from aws_extras.entry import initialize
+
+    if "awsx" not in c7n.resources.PROVIDER_NAMES:
+        c7n.resources.PROVIDER_NAMES += ("awsx",)
+    initialize()
+    found = c7n.resources.load_available()
+    c7n.resources.load_resources(("awsx.*",))
+    c7n.resources.LOADED.add("awsx")
+    return found + ["awsx"]
+
+
+def provider_versions() -> dict[str, str]:
+    """The installed provider packages and their versions, without importing them."""
+    versions = {}
+    for package in PROVIDER_PACKAGES.values():
+        if importlib.util.find_spec(package) is None:
+            continue
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = "unknown"
+    return versions
+
+
+def schema_key() -> str:
+    """Identifies a generated schema: the c7n version, the installed providers and their
+    versions, and the awsx resource map."""
+    from c7n.version import version
+
+    from aws_extras.resource_map import ResourceMap
+
+    extras = hashlib.sha256(json.dumps([provider_versions(), ResourceMap], sort_keys=True)
+                            .encode("utf-8")).hexdigest()[:12]
+    return f"c7n-{version}-awsx-{extras}"
+
+
+def load_schema(schema_dir: Optional[Path] = DEFAULT_SCHEMA_DIR) -> dict[str, Any]:
+    """Returns the c7n policy schema, generating and saving it if there is no cached copy.
+
+    Args:
+        schema_dir (Optional[Path]): Where generated schemas are kept, None disables the cache.
+
+    Returns:
+        dict[str, Any]: The JSON schema.
+    """
+    schema_path = schema_dir / f"{schema_key()}.json" if schema_dir is not None else None
+    if schema_path is not None:
+        try:
+            with schema_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    from c7n.schema import generate
+
+    load_providers()
+    schema = generate()
+    if schema_path is not None:
+        try:
+            schema_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=schema_path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(schema, f)
+            os.replace(temp_name, schema_path)
+            LOGGER.info("Saved generated schema to %s", schema_path)
+        except OSError as e:
+            LOGGER.warning("Could not save generated schema to %s: %s", schema_path, e)
+    return schema
+
+
+class SchemaValidators:
+    """Compiled validators for the policy schema, narrowed to the resource types of a file.
+
+    Args:
+        schema (dict[str, Any]): The full policy schema.
+    """
+
+    def __init__(self, schema: dict[str, Any]) -> None:
+        from c7n.schema import JsonSchemaValidator
+
+        self.schema = schema
+        self.validator = JsonSchemaValidator(schema)
+        # Resource type or alias -> its entry in the policy schema's anyOf
+        self.resource_refs: dict[str, dict[str, str]] = {}
+        for ref in schema["properties"]["policies"]["items"]["anyOf"]:
+            resource_type = ref["$ref"].split("/")[-2]
+            policy = schema["definitions"]["resources"][resource_type]["policy"]
+            for name in policy["allOf"][1]["properties"]["resource"]["enum"]:
+                self.resource_refs.setdefault(name, ref)
+        self.validators: dict[frozenset, Any] = {}
+
+    def validator_for(self, resource_types: frozenset) -> Any:
+        """A validator whose policy schema only allows the given resource types.
+
+        Like ``custodian validate``, which generates a schema for just the resource types in
+        the file, since trying every resource type's schema on every policy is slow. When a
+        type is unknown the full schema is used, so the error lists every valid type.
+        """
+        from c7n.schema import JsonSchemaValidator
+
+        if not resource_types.issubset(self.resource_refs):
+            return self.validator
+        if resource_types not in self.validators:
+            refs = {self.resource_refs[name]["$ref"] for name in resource_types}
+            schema = dict(self.schema)
+            schema["properties"] = dict(schema["properties"])
+            schema["properties"]["policies"] = dict(schema["properties"]["policies"], items={
+                "anyOf": [ref for ref in self.schema["properties"]["policies"]["items"]["anyOf"]
+                          if ref["$ref"] in refs]})
+            self.validators[resource_types] = JsonSchemaValidator(schema)
+        return self.validators[resource_types]
+
+
+def resource_types(data: dict[str, Any]) -> frozenset:
+    """The resource types a policy file uses; anything that is not a type name is kept as is,
+    so it never matches a known type."""
+    policies = data.get("policies", ())
+    if not isinstance(policies, list):
+        return frozenset()
+    types = set()
+    for policy_data in policies:
+        resource = policy_data.get("resource") if isinstance(policy_data, dict) else None
+        types.add(resource if isinstance(resource, str) else repr(resource))
+    return frozenset(types)
+
+
+@cache
+def validators(schema_dir: Optional[Path] = DEFAULT_SCHEMA_DIR) -> SchemaValidators:
+    """Returns the compiled validators for the c7n policy schema, once per process."""
+    return SchemaValidators(load_schema(schema_dir))
+
+
+def iter_errors(data: dict[str, Any], schema_dir: Optional[Path] = DEFAULT_SCHEMA_DIR) -> Iterator[Any]:
+    """Validates a policy file's data, yielding the most specific error for each problem.
+
+    Each file is checked against the schema narrowed to its resource types. Type errors
+    against unexpanded variable references such as ``{account_id}`` are ignored, as
+    ``custodian validate`` does.
+    """
+    from c7n.schema import is_c7n_placeholder, specific_error
+
+    for error in validators(schema_dir).validator_for(resource_types(data)).iter_errors(data):
+        error = specific_error(error)
+        if error.validator == "type" and is_c7n_placeholder(error.instance):
+            continue
+        yield error
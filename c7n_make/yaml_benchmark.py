@@ -0,0 +1,90 @@
+"""Measures documents per second for each YAML loading path over a policy corpus.
+
+Usage:
+    python -m c7n_make.yaml_benchmark policies/ --repeat 3
+"""
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import yaml
+
+from c7n_make import yaml_loading
+
+LOGGER = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def _pure_python(text: str) -> Iterator[Any]:
+    return yaml.load_all(text, Loader=yaml.SafeLoader)
+
+
+def _round_trip(text: str) -> Iterator[Any]:
+    return yaml_loading.round_trip_yaml().load_all(text)
+
+
+def loaders() -> dict[str, Callable[[str], Iterator[Any]]]:
+    """The loading paths to compare, keyed by a short display name."""
+    paths = {"pyyaml-safe": _pure_python}
+    if yaml_loading.HAVE_LIBYAML:
+        paths["libyaml-csafe"] = yaml_loading.safe_load_all
+    try:
+        import ruamel.yaml  # noqa: F401
+    except ImportError:
+        LOGGER.info("ruamel.yaml is not installed, skipping the round trip loader.")
+    else:
+        paths["ruamel-rt"] = _round_trip
+    return paths
+
+
+def read_corpus(sources: list[str]) -> list[str]:
+    """Reads every .yml and .yaml file under the given files or directories into memory."""
+    texts = []
+    for source in sources:
+        path = Path(source)
+        files = sorted(path.rglob("*.y*ml")) if path.is_dir() else [path]
+        for file_path in files:
+            if file_path.suffix in (".yml", ".yaml"):
+                texts.append(file_path.read_text(encoding="utf-8"))
+    return texts
+
+
+def benchmark(texts: list[str], load_all: Callable[[str], Iterator[Any]], repeat: int) -> tuple[int, int, float]:
+    """Parses the whole corpus repeat times with one loader.
+
+    Returns:
+        tuple[int, int, float]: Documents parsed per pass, files that failed to parse, best pass in seconds.
+    """
+    best = float("inf")
+    documents = failures = 0
+    for _ in range(repeat):
+        documents = failures = 0
+        start = time.perf_counter()
+        for text in texts:
+            try:
+                documents += sum(1 for _ in load_all(text))
+            except Exception:  # each loader has its own error types
+                failures += 1
+        best = min(best, time.perf_counter() - start)
+    return documents, failures, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the YAML loaders over a policy corpus.")
+    parser.add_argument("sources", nargs="+", help="Policy files or directories")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes per loader, the best is reported (default: 3)")
+    args = parser.parse_args()
+
+    texts = read_corpus(args.sources)
+    LOGGER.info("Loaded %d file(s), %d bytes.", len(texts), sum(len(text) for text in texts))
+    print(f"{'loader':<16}{'documents':>10}{'failures':>10}{'seconds':>10}{'docs/s':>12}")
+    for name, load_all in loaders().items():
+        documents, failures, seconds = benchmark(texts, load_all, args.repeat)
+        rate = documents / seconds if seconds else float("inf")
+        print(f"{name:<16}{documents:>10}{failures:>10}{seconds:>10.3f}{rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Shared YAML loading, using LibYAML when PyYAML was built with it.
+
+Loading is the largest single CPU cost of every tool in this repo. The C loader is
+several times faster than the pure Python one and accepts the same documents, so it is
+used whenever it is available. The ruamel round trip loader is much slower again and is
+only for callers that need to keep comments and formatting when writing YAML back out.
+"""
+import io
+from typing import Any, Iterator, TextIO, Union
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without LibYAML
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+HAVE_LIBYAML = SafeLoader is not yaml.SafeLoader
+
+Stream = Union[str, bytes, TextIO]
+
+
+def safe_load(stream: Stream) -> Any:
+    """Parses a single YAML document with the fastest safe loader available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_load_all(stream: Stream) -> Iterator[Any]:
+    """Lazily parses every YAML document with the fastest safe loader available."""
+    return yaml.load_all(stream, Loader=SafeLoader)
+
+
+def round_trip_yaml() -> Any:
+    """Returns a ruamel.yaml round trip instance, which keeps comments and ordering.
+
+    Only use this when the YAML is written back out. ruamel is imported here rather
+    than at module level so the fast path does not pay for it.
+    """
+    from ruamel.yaml import YAML
+
+    return YAML(typ="rt")
+
+
+def round_trip_load(stream: Stream) -> Any:
+    """Parses a single YAML document, keeping comments and ordering for a later dump."""
+    if isinstance(stream, bytes):
+        stream = io.BytesIO(stream)
+    return round_trip_yaml().load(stream)
@@ -0,0 +1,82 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from c7n_checker.c7n_checker_app.cache import ResultCache, canonical_hash
+
+POLICY = """policies:
+  - name: queues
+    resource: aws.sqs
+    filters: [{"tag:Owner": absent}]
+"""
+
+REFORMATTED = """# the same policy
+policies:
+- resource: aws.sqs
+  filters:
+    - "tag:Owner": absent
+  name: queues
+"""
+
+
+def test_canonical_hash():
+    assert canonical_hash(POLICY) == canonical_hash(REFORMATTED)
+    assert canonical_hash(POLICY) != canonical_hash(POLICY.replace("queues", "other"))
+    assert canonical_hash("policies: [") != canonical_hash("policies:  [")
+
+
+def test_canonical_hash_duplicate_keys():
+    duplicated = POLICY.replace("    resource: aws.sqs\n", "    resource: aws.sqs\n    resource: aws.sqs\n")
+    assert canonical_hash(duplicated) != canonical_hash(POLICY)
+    assert canonical_hash(duplicated) != canonical_hash(duplicated.replace("\n  - name", "\n  -  name"))
+
+
+def test_canonical_hash_unsortable_keys():
+    assert canonical_hash("policies: []\n1: x\n") != canonical_hash("policies: []\n2: x\n")
+
+
+def test_canonical_hash_keeps_types():
+    assert canonical_hash("a: 1\n") != canonical_hash("a: '1'\n")
+    assert canonical_hash("1: a\n") != canonical_hash("'1': a\n")
+    assert canonical_hash("a: 2024-01-01\n") != canonical_hash("a: '2024-01-01'\n")
+    assert canonical_hash("a: 1\nb: 2\n") == canonical_hash("b: 2\na: 1\n")
+
+
+def test_lru_ttl_and_invalidation(monkeypatch):
+    cache = ResultCache(max_entries=2, ttl=60)
+    first, second, third = (cache.key(POLICY.replace("queues", name)) for name in ("a", "b", "c"))
+    cache.put(first, 1)
+    cache.put(second, 2)
+    assert cache.get(first) == 1
+    cache.put(third, 3)
+    assert (cache.get(first), cache.get(second), cache.get(third)) == (1, None, 3)
+
+    monkeypatch.setattr("time.monotonic", lambda: 1e12)
+    assert cache.get(first) is None
+    monkeypatch.undo()
+
+    cache.put(cache.key(POLICY), "results")
+    assert cache.get(cache.key(REFORMATTED)) == "results"
+    assert cache.invalidate() == 1
+    assert cache.get(cache.key(POLICY)) is None
+
+
+def test_django_backend():
+    cache = ResultCache(max_entries=2, ttl=60, backend=LocMemCache("test-checker-cache", {}))
+    key = cache.key(POLICY)
+    cache.put(key, "results")
+    assert cache.get(cache.key(REFORMATTED)) == "results"
+    assert cache.invalidate() == 1
+    assert cache.get(cache.key(POLICY)) is None
+
+
+def test_only_policy_failures_are_cached():
+    from c7n_checker.c7n_checker_app.views import cacheable
+
+    def results(valid, ran, timed_out=False):
+        return {"yaml": {"ok": True, "timed_out": False}, "validate": {"ok": valid, "timed_out": False},
+                "dry_run": {"ok": ran, "timed_out": timed_out}}
+
+    assert cacheable(results(True, True))
+    assert cacheable(results(False, False))
+    # A valid policy whose run failed, e.g. because moto was unreachable
+    assert not cacheable(results(True, False))
+    assert not cacheable(results(True, True, timed_out=True))
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from c7n_checker.c7n_checker_app.service import (MOTO_ACCOUNT_HEADER, RESOURCE_COUNT, RunCancelled, ServiceBusy,
+                                                 ServiceTimeout, ServiceUnavailable, ValidationService, cancellable,
+                                                 moto_account)
+
+POLICY = """policies:
+  - name: queues
+    resource: aws.sqs
+"""
+
+
+def test_validate_in_process():
+    service = ValidationService(0, 2, queue_timeout=1, timeout=30, environment={})
+    try:
+        assert service.validate(POLICY) == (True, "Configuration valid")
+        ok, output = service.validate(POLICY.replace("aws.sqs", "aws.not-a-resource"))
+        assert not ok and output.endswith("Configuration invalid")
+    finally:
+        service.shutdown()
+
+
+def test_busy_and_timeout():
+    service = ValidationService(0, 1, queue_timeout=0.05, timeout=0.05, environment={})
+    release = threading.Event()
+    try:
+        with pytest.raises(ServiceTimeout):
+            service.call(release.wait)
+        # The timed out call still holds the only slot until it finishes.
+        with pytest.raises(ServiceBusy):
+            service.call(str)
+        release.set()
+        assert service.call(str, "done") == "done"
+    finally:
+        release.set()
+        service.shutdown()
+
+
+def test_timeout_cancels_the_run():
+    service = ValidationService(0, 1, queue_timeout=1, timeout=0.05, environment={})
+    cancel = threading.Event()
+    try:
+        with pytest.raises(ServiceTimeout):
+            service.call(cancel.wait, 30, cancel=cancel)
+        assert cancel.is_set()
+        # The cancelled run gave its slot back.
+        assert service.call(str, "next") == "next"
+    finally:
+        service.shutdown()
+
+
+def test_acall_times_out_without_blocking():
+    service = ValidationService(0, 2, queue_timeout=1, timeout=0.1, environment={})
+    release = threading.Event()
+
+    async def check():
+        waiting = asyncio.ensure_future(service.acall(release.wait))
+        assert await service.acall(str, "meanwhile") == "meanwhile"
+        with pytest.raises(ServiceTimeout):
+            await waiting
+
+    try:
+        asyncio.run(check())
+    finally:
+        release.set()
+        service.shutdown()
+
+
+def test_stream_run_times_out_while_logging(monkeypatch):
+    def chatty(yaml_content, messages, cancel, isolate):
+        while not cancel.wait(0.01):
+            messages.put("still going")
+        messages.put(None)
+        return False, ""
+
+    monkeypatch.setattr("c7n_checker.c7n_checker_app.service.stream_policy", chatty)
+    service = ValidationService(0, 1, queue_timeout=1, timeout=0.2, environment={})
+
+    async def consume():
+        return [event async for event, _ in service.stream_run(POLICY)]
+
+    try:
+        with pytest.raises(ServiceTimeout):
+            asyncio.run(asyncio.wait_for(consume(), 5))
+    finally:
+        service.shutdown()
+
+
+def test_cancellable_stops_api_calls():
+    client = boto3.client("sqs", region_name="us-east-1", aws_access_key_id="a", aws_secret_access_key="b")
+    cancel = threading.Event()
+    with Stubber(client) as stubber, cancellable(cancel):
+        stubber.add_response("list_queues", {})
+        client.list_queues()
+        cancel.set()
+        with pytest.raises(RunCancelled):
+            client.list_queues()
+
+
+def test_resource_count():
+    line = "custodian.policy:INFO policy:vols resource:aws.ebs region:us-east-1 count:12 time:0.31"
+    assert RESOURCE_COUNT.search(line).groupdict() == {
+        "policy": "vols", "resource": "aws.ebs", "region": "us-east-1", "count": "12"}
+
+
+def test_moto_account_header():
+    headers = []
+
+    def capture(request, **kwargs):
+        headers.append(request.headers.get(MOTO_ACCOUNT_HEADER))
+        raise RunCancelled("not sent")
+
+    with moto_account("111122223333"):
+        client = boto3.client("sts", region_name="us-east-1", aws_access_key_id="a", aws_secret_access_key="b")
+        client.meta.events.register("before-send", capture)
+        with pytest.raises(RunCancelled):
+            client.get_caller_identity()
+    # Clients outlive the run, the header does not.
+    with pytest.raises(RunCancelled):
+        client.get_caller_identity()
+    assert headers == [b"111122223333", None]
+
+
+def test_broken_workers_are_replaced(monkeypatch):
+    starts = []
+
+    def flaky_warm_worker(environment):
+        starts.append(environment)
+        if len(starts) == 1:
+            raise RuntimeError("The config profile (moto) could not be found")
+
+    monkeypatch.setattr("c7n_checker.c7n_checker_app.service.warm_worker", flaky_warm_worker)
+    service = ValidationService(0, 1, queue_timeout=1, timeout=5, environment={})
+    try:
+        assert not service.warm()
+        assert service.call(str, "recovered") == "recovered"
+    finally:
+        service.shutdown()
+
+
+def test_workers_that_cannot_start_are_unavailable(monkeypatch):
+    def failing_warm_worker(environment):
+        raise RuntimeError("The config profile (moto) could not be found")
+
+    monkeypatch.setattr("c7n_checker.c7n_checker_app.service.warm_worker", failing_warm_worker)
+    service = ValidationService(0, 1, queue_timeout=1, timeout=5, environment={})
+    try:
+        with pytest.raises(ServiceUnavailable):
+            service.call(str, "never")
+        with pytest.raises(ServiceUnavailable):
+            asyncio.run(service.acall(str, "never"))
+        # Every slot was given back.
+        monkeypatch.setattr("c7n_checker.c7n_checker_app.service.warm_worker", lambda environment: None)
+        assert service.call(str, "fixed") == "fixed"
+    finally:
+        service.shutdown()
@@ -0,0 +1,21 @@
+import asyncio
+import concurrent.futures
+
+from c7n_checker.c7n_checker_app import views
+
+
+class DyingService:
+    async def stream_run(self, yaml_content):
+        yield "log", "starting"
+        raise concurrent.futures.process.BrokenProcessPool("worker died")
+
+
+def test_dry_run_stream_ends_with_an_error_when_the_worker_dies(monkeypatch):
+    monkeypatch.setattr(views, "get_service", DyingService)
+
+    async def consume():
+        return [chunk async for chunk in views.DryRunStreamView().events("policies: []")]
+
+    chunks = asyncio.run(consume())
+    assert chunks == ['event: log\ndata: "starting"\n\n',
+                      'event: error\ndata: "The run failed: BrokenProcessPool"\n\n']
@@ -0,0 +1,101 @@
+from c7n_docs_checker.benchmark import compare, main, run_benchmark
+from c7n_docs_checker.timing import percentile, recording, timed
+
+RST = """Queues
+======
+
+.. code-block:: yaml
+
+    policies:
+      - name: tag-queues
+        resource: aws.sqs
+
+.. code-block:: yaml
+
+    - name: fragment
+      resource: aws.sqs
+"""
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile([float(value) for value in range(1, 101)], 95) == 95.0
+
+
+def test_timed_only_records_inside_recording():
+    with timed("outside"):
+        pass
+    with recording() as timings:
+        with timings.example("a.yaml"), timed("stage"):
+            pass
+    assert list(timings.samples) == ["stage"]
+    assert timings.samples["stage"][0][0] == "a.yaml"
+
+
+def test_benchmark(tmp_path, capsys):
+    snapshot = tmp_path / "snapshot"
+    snapshot.mkdir()
+    (snapshot / "sqs.rst").write_text(RST, encoding="utf-8")
+    (snapshot / "ec2.yaml").write_text("policies:\n  - name: ec2\n    resource: aws.ec2\n", encoding="utf-8")
+
+    report = run_benchmark(snapshot, slowest=2)
+    assert report["snapshot"]["examples"] == 3
+    assert {"extraction", "normalization", "yaml_parse", "schema"} <= set(report["stages"])
+    assert report["stages"]["normalization"]["count"] == 3
+    assert {entry["example"] for entry in report["slowest"]} <= {"sqs.rst#1", "sqs.rst#2", "ec2.yaml", "sqs.rst"}
+
+    assert compare(report, report, 1.25) == []
+    slower = {"stages": {"schema": dict(report["stages"]["schema"], p50=report["stages"]["schema"]["p50"] * 2)}}
+    assert compare(slower, report, 1.25)[0].startswith("schema:")
+
+    assert main([str(snapshot), "--json", str(tmp_path / "report.json")]) == 0
+    assert main([str(snapshot), "--baseline", str(tmp_path / "report.json"), "--max-slowdown", "1000"]) == 0
+    assert main([str(snapshot), "--expect-digest", "nope"]) == 2
+    assert "normalization" in capsys.readouterr().out
+
+
+def test_pipeline_reports_worker_timings(tmp_path, caplog):
+    import logging
+
+    from c7n_docs_checker.check_examples import validate_yaml_files_in_folder
+    from c7n_docs_checker.check_examples_in_docstrings import process_py_files
+
+    source, examples = tmp_path / "src", tmp_path / "examples"
+    source.mkdir()
+    (source / "sqs.py").write_text(f'"""Queues.\n\n{RST.split("======", 1)[1]}"""\n', encoding="utf-8")
+    with caplog.at_level(logging.INFO):
+        process_py_files(source, examples, processes=2, record_timings=True)
+        validate_yaml_files_in_folder(examples, record_timings=True)
+    tables = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Stage timings")]
+    assert len(tables) == 2
+    assert "extraction" in tables[0]
+    assert "schema" in tables[1] and "normalization" in tables[1]
+    # Each example in a batch gets its own samples, listed with its path.
+    slowest = tables[1].split("slowest examples (ms):\n")[1].splitlines()
+    assert sorted(line.split()[1] for line in slowest) == sorted(str(path) for path in examples.rglob("*.yml"))
+
+
+def test_batch_samples_are_per_example():
+    from c7n_docs_checker.engine import get_engine
+
+    engine = get_engine()
+    valid = "policies:\n  - name: a\n    resource: aws.sqs\n"
+    with recording() as timings:
+        engine.validate_texts([valid, valid.replace("name: a", "name: b"), "policies: ["], ["a.yml", "b.yml", "c.yml"])
+    report = timings.report()
+    assert {entry["example"] for entry in report["slowest"]} == {"a.yml", "b.yml", "c.yml"}
+    assert {example for example, _ in timings.samples["schema"]} >= {"a.yml", "b.yml"}
+    assert report["stages"]["yaml_parse"]["count"] >= 3
+
+
+def test_worker_start_up_is_sent_with_the_first_result(monkeypatch):
+    from c7n_docs_checker import engine
+    from c7n_docs_checker.timing import recorded
+
+    monkeypatch.setattr(engine, "_ENGINE", None)
+    monkeypatch.setattr(engine, "ValidationEngine", object)
+    engine.warm_worker({}, record=True)
+    _, samples = recorded(len, [1])
+    assert [stage for stage in samples] == ["engine_startup"]
+    assert recorded(len, [1])[1] == {}
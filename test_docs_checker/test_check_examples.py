@@ -0,0 +1,20 @@
+from c7n_docs_checker.check_examples import normalize_example, validate_example, validate_examples
+
+FRAGMENT = """- name: tag-queues ─▶ the policy name
+  resource: aws.sqs
+"""
+
+
+def test_normalize_example():
+    assert normalize_example(FRAGMENT) == "policies:\n  - name: tag-queues \n    resource: aws.sqs\n  "
+    assert normalize_example("policies: []\n") == "policies: []\n"
+
+
+def test_validation_does_not_touch_the_files(tmp_path):
+    example = tmp_path / "sqs.yaml"
+    example.write_text(FRAGMENT, encoding="utf-8")
+
+    assert validate_example(example) == (example, True, "")
+    assert validate_examples([example]) == [(example, True, "")]
+    assert example.read_text(encoding="utf-8") == FRAGMENT
+    assert [path.name for path in tmp_path.iterdir()] == ["sqs.yaml"]
@@ -0,0 +1,56 @@
+from c7n_docs_checker.check_examples_in_docstrings import fix_policies_text, process_py_files
+
+SOURCE = '''
+class TagQueue:
+    """Tags a queue.
+
+    .. code-block:: yaml
+
+        - name: tag-queues
+          resource: aws.sqs
+    """
+
+
+def untag():
+    """Untags a queue.
+
+    .. code-block:: yaml
+
+        policies:
+          - name: untag-queues
+            resource: aws.sqs
+    """
+
+
+def commented():
+    """Only a comment.
+
+    .. code-block:: yaml
+
+        # see the policies above
+    """
+'''
+
+
+def test_fix_policies_text():
+    assert fix_policies_text("policies: []\n") == "policies: []\n"
+    assert fix_policies_text("- name: a\n") == "policies:\n- name: a\n"
+    assert fix_policies_text("name: a\n") == "policies:\n- name: a\n"
+    assert fix_policies_text("just text") == "just text"
+    assert fix_policies_text("# nothing but a comment\n") == "# nothing but a comment\n"
+    assert fix_policies_text("") == ""
+
+
+def test_process_py_files(tmp_path):
+    source_dir, destination_dir = tmp_path / "src", tmp_path / "examples"
+    (source_dir / "resources").mkdir(parents=True)
+    (source_dir / "resources" / "sqs.py").write_text(SOURCE, encoding="utf-8")
+    (source_dir / "empty.py").write_text("x = 1\n", encoding="utf-8")
+
+    process_py_files(source_dir, destination_dir, processes=2)
+
+    assert sorted(path.name for path in destination_dir.rglob("*.yml")) == ["sqs_1.yml", "sqs_2.yml", "sqs_3.yml"]
+    first = (destination_dir / "resources" / "sqs_1.yml").read_text(encoding="utf-8")
+    assert first.startswith("policies:\n")
+    assert "name: tag-queues" in first
+    assert (destination_dir / "resources" / "sqs_3.yml").read_text(encoding="utf-8") == "# see the policies above"
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from c7n_docs_checker.exemptions import Exemption, ExemptionRules, get_rules
+
+
+def test_default_rules():
+    rules = get_rules()
+    assert rules.classify(Path("aws/deploy.yaml"), "export OCI_CLI=1\n").category == "skipped-as-bash"
+    assert rules.classify(Path("gh/deployment_2.yaml"), "on: push\n").category == "skipped-as-other-config"
+    assert rules.classify(Path("aws/lambda_3.yaml"), "policies: []\n") is None
+
+
+def test_error_rules_only_excuse_failures():
+    rules = ExemptionRules([
+        Exemption("known-fragment", text="discard-percent", error=""),
+        Exemption("known-fragment", path="lambda_2", error="top level keys"),
+        Exemption("known-upstream-bug", text="remediate"),
+    ])
+    fragment = "discard-percent: 20\n"
+    assert rules.classify(Path("a.yaml"), fragment) is None
+    assert rules.classify(Path("a.yaml"), fragment, "any error").category == "known-fragment"
+    assert rules.classify(Path("lambda_2.yaml"), "x", "top level keys") is rules.exemptions[1]
+    assert rules.classify(Path("lambda_3.yaml"), "x", "top level keys") is None
+    # The first applicable rule wins, wherever its text is.
+    assert rules.classify(Path("a.yaml"), "remediate\ndiscard-percent", "error") is rules.exemptions[0]
@@ -0,0 +1,80 @@
+from c7n_docs_checker.manifest import ExtractionManifest, ValidationCache
+
+
+def test_unchanged_blocks_are_not_rewritten(tmp_path):
+    source = tmp_path / "doc.rst"
+    source.write_text("doc", encoding="utf-8")
+    first, second = tmp_path / "out" / "doc_1.yaml", tmp_path / "out" / "doc_2.yaml"
+
+    manifest = ExtractionManifest(tmp_path / "manifest.json")
+    assert not manifest.unchanged(source)
+    assert manifest.write_blocks(source, {first: "a: 1\n", second: "b: 2\n"}) == [first, second]
+    manifest.save()
+
+    manifest = ExtractionManifest(tmp_path / "manifest.json")
+    assert manifest.unchanged(source)
+
+    source.write_text("doc, edited", encoding="utf-8")
+    assert not manifest.unchanged(source)
+    assert manifest.write_blocks(source, {first: "a: 2\n"}) == [first]
+    assert first.read_text(encoding="utf-8") == "a: 2\n"
+    assert not second.exists()
+
+    first.unlink()
+    assert not manifest.unchanged(source)
+
+
+def test_validation_cache_is_per_version(tmp_path):
+    path, policy = tmp_path / "cache.json", tmp_path / "policy.yaml"
+    cache = ValidationCache(path, version="1")
+    cache.put(policy, "text", False, "broken")
+    cache.save()
+
+    assert ValidationCache(path, version="1").get(policy, "text") == (False, "broken")
+    assert ValidationCache(path, version="1").get(policy, "other text") is None
+    assert ValidationCache(path, version="1").get(tmp_path / "renamed.yaml", "text") is None
+    assert ValidationCache(path, version="2").get(policy, "text") is None
+
+
+def test_validation_cache_tracks_checker_code(tmp_path, monkeypatch):
+    from c7n_docs_checker import manifest
+
+    path = tmp_path / "cache.json"
+    policy = tmp_path / "policy.yaml"
+    cache = ValidationCache(path)
+    cache.put(policy, "text", True, "")
+    cache.save()
+    assert ValidationCache(path).get(policy, "text") == (True, "")
+    monkeypatch.setattr(manifest, "checker_key", lambda: "normalization-changed")
+    assert ValidationCache(path).get(policy, "text") is None
+
+
+def test_extractor_change_re_extracts(tmp_path):
+    source = tmp_path / "doc.rst"
+    source.write_text("doc", encoding="utf-8")
+    first, second = tmp_path / "out" / "doc_1.yaml", tmp_path / "out" / "doc_2.yaml"
+    manifest = ExtractionManifest(tmp_path / "manifest.json", version="1")
+    manifest.write_blocks(source, {first: "a: 1\n", second: "b: 2\n"})
+    manifest.save()
+    assert ExtractionManifest(tmp_path / "manifest.json", version="1").unchanged(source)
+
+    manifest = ExtractionManifest(tmp_path / "manifest.json", version="2")
+    assert not manifest.unchanged(source)
+    # The new extractor finds one block, the old second block is removed.
+    assert manifest.write_blocks(source, {first: "a: 1\n"}) == []
+    assert not second.exists()
+    manifest.save()
+    assert ExtractionManifest(tmp_path / "manifest.json", version="2").unchanged(source)
+
+
+def test_extractor_key_is_the_default(tmp_path, monkeypatch):
+    from c7n_docs_checker import manifest
+
+    source = tmp_path / "doc.rst"
+    source.write_text("doc", encoding="utf-8")
+    extraction = ExtractionManifest(tmp_path / "manifest.json")
+    extraction.write_blocks(source, {tmp_path / "doc.yaml": "a: 1\n"})
+    extraction.save()
+    assert ExtractionManifest(tmp_path / "manifest.json").unchanged(source)
+    monkeypatch.setattr(manifest, "extractor_key", lambda: "extraction-changed")
+    assert not ExtractionManifest(tmp_path / "manifest.json").unchanged(source)
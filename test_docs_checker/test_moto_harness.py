@@ -0,0 +1,35 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from c7n_docs_checker.moto_harness import MotoServer, count_api_calls, output_dir_for, pinned_endpoint
+
+
+def test_count_api_calls(tmp_path):
+    client = boto3.client("sqs", region_name="us-east-1", aws_access_key_id="a", aws_secret_access_key="b")
+    with Stubber(client) as stubber, count_api_calls() as calls:
+        stubber.add_response("list_queues", {})
+        stubber.add_response("list_queues", {})
+        client.list_queues()
+        client.list_queues()
+    assert calls == {"sqs.ListQueues": 2}
+
+
+def test_pinned_endpoint():
+    with pinned_endpoint("http://127.0.0.1:1"):
+        client = boto3.client("sqs", region_name="us-east-1", endpoint_url="https://sqs.us-east-1.amazonaws.com")
+    assert client.meta.endpoint_url == "http://127.0.0.1:1"
+    assert boto3.client("sqs", region_name="us-east-1").meta.endpoint_url != "http://127.0.0.1:1"
+
+
+def test_output_dirs_are_per_example(tmp_path):
+    assert output_dir_for(tmp_path / "aws" / "sqs_1.yaml", tmp_path, tmp_path / "out") == tmp_path / "out" / "aws" / "sqs_1"
+
+
+def test_moto_server():
+    pytest.importorskip("moto.server")
+    with MotoServer() as server, pinned_endpoint(server.endpoint_url):
+        client = boto3.client("sqs", region_name="us-east-1", aws_access_key_id="testing",
+                              aws_secret_access_key="testing")
+        client.create_queue(QueueName="example-queue")
+        assert client.list_queues()["QueueUrls"][0].endswith("/example-queue")
@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from c7n_docs_checker.rst_blocks import doctree_yaml_blocks, scan_yaml_blocks
+
+SIMPLE = """Tag queues
+==========
+
+Some text with *inline* markup and a :ref:`role` docutils does not know.
+
+:example:
+
+.. code-block:: yaml
+
+    policies:
+      - name: tag-queues
+        resource: aws.sqs
+
+\t  # a tab
+
+.. code-block:: python
+
+    .. code-block:: yaml
+
+        not: a block
+
+.. code:: yaml
+
+  - name: second
+    resource: aws.ec2
+.. sourcecode:: json
+
+    {}
+"""
+
+# Each of these is left to docutils.
+UNUSUAL = [
+    "Text\n\n- item\n\n  .. code-block:: yaml\n\n      nested: true\n",
+    "Text\n.. code-block:: yaml\n\n    continuation: true\n",
+    ".. code-block:: yaml\n   :class: highlight\n\n    options: true\n",
+    ".. code-block:: yaml\n    arguments: true\n",
+    ".. code-block:: yaml\n\nno: content\n",
+    ".. code-block:: yaml two\n\n    too: many\n",
+    ".. code-block::yaml\n\n    not: a directive\n",
+    ".. note::\n\n   .. code-block:: yaml\n\n       in: a note\n",
+    ".. include:: other.rst\n",
+    "Example::\n\n    .. code-block:: yaml\n\n        literal: text\n",
+]
+
+
+def test_scanner_matches_docutils():
+    blocks = scan_yaml_blocks(SIMPLE)
+    assert blocks == doctree_yaml_blocks(SIMPLE)
+    assert len(blocks) == 2
+    assert blocks[0].startswith("policies:\n  - name: tag-queues")
+    assert blocks[0].endswith("\n\n      # a tab")
+
+
+@pytest.mark.parametrize("rst_content", UNUSUAL)
+def test_scanner_gives_up_on_unusual_documents(rst_content):
+    assert scan_yaml_blocks(rst_content) is None
+
+
+def _corpus():
+    # Set C7N_DOCS_DIR to a cloud-custodian checkout's docs to check the whole corpus.
+    docs_dir = os.environ.get("C7N_DOCS_DIR")
+    return sorted(Path(docs_dir).rglob("*.rst")) if docs_dir else []
+
+
+@pytest.mark.skipif(not _corpus(), reason="C7N_DOCS_DIR is not set")
+@pytest.mark.parametrize("rst_file", _corpus(), ids=str)
+def test_scanner_matches_docutils_on_corpus(rst_file):
+    rst_content = rst_file.read_text(encoding="utf-8")
+    blocks = scan_yaml_blocks(rst_content)
+    if blocks is not None:
+        assert blocks == doctree_yaml_blocks(rst_content)
@@ -0,0 +1,74 @@
+from c7n_docs_checker.engine import get_engine
+
+VALID = """policies:
+  - name: tag-queues
+    resource: aws.sqs
+    actions:
+      - type: tag
+        key: owner
+        value: unknown
+"""
+
+
+def test_valid_file(tmp_path):
+    policy = tmp_path / "valid.yml"
+    policy.write_text(VALID, encoding="utf-8")
+    assert get_engine().validate_file(policy) == (policy, True, "")
+
+
+def test_schema_error(tmp_path):
+    policy = tmp_path / "invalid.yml"
+    policy.write_text(VALID.replace("type: tag", "type: nope"), encoding="utf-8")
+    path, ok, error = get_engine().validate_file(policy)
+    assert not ok
+    assert "Error on policy:tag-queues resource:aws.sqs" in error
+
+
+def test_structure_and_policy_errors():
+    engine = get_engine()
+    assert "top level data structure should be a mapping" in engine.validate_text("- name: a\n")[0]
+    errors = engine.validate_text(
+        "policies:\n  - name: a\n    resource: aws.ec2\n    filters:\n      - type: marked-for-op\n        op: bogus\n")
+    assert errors[0].startswith("Policy: a is invalid")
+
+
+def test_batch_matches_single_file_validation(tmp_path):
+    engine = get_engine()
+    texts = [
+        VALID,
+        VALID + "  - name: second\n    resource: aws.sqs\n    actions:\n      - type: nope\n",
+        VALID + "  - name: tag-queues\n    resource: aws.sqs\n",
+        "policies:\n  - name: a\n    resource: aws.ec2\n    filters:\n      - type: marked-for-op\n        op: bogus\n",
+        "policies:\n  - name: no-resource\n",
+        "vars:\n  owner: me\n" + VALID,
+        "- name: a\n",
+        "policies: [\n",
+        VALID,
+    ]
+    assert engine.validate_texts(texts) == [engine.validate_text(text) for text in texts]
+
+    paths = []
+    for index, text in enumerate([VALID, "policies:\n  - name: no-resource\n"]):
+        paths.append(tmp_path / f"policy_{index}.yml")
+        paths[-1].write_text(text, encoding="utf-8")
+    assert engine.validate_files(paths) == [engine.validate_file(path) for path in paths]
+
+
+def test_run_file_captures_only_its_own_thread(tmp_path, monkeypatch):
+    import logging
+    import threading
+
+    def fake_main(argv):
+        logging.getLogger("custodian.policy").info("policy:p resource:aws.sqs region:us-east-1 count:1")
+        logging.getLogger("custodian.policy").debug("too detailed")
+        other = threading.Thread(target=logging.getLogger("custodian.other").warning, args=("another run",))
+        other.start()
+        other.join()
+
+    monkeypatch.setattr("c7n.cli.main", fake_main)
+    root = logging.getLogger()
+    level = root.level
+    ok, log = get_engine().run_file(tmp_path / "policy.yml", str(tmp_path / "output"))
+    assert ok
+    assert log == "custodian.policy:INFO policy:p resource:aws.sqs region:us-east-1 count:1\n"
+    assert root.level == level
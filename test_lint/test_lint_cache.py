@@ -0,0 +1,38 @@
+import os
+
+from c7n_make.lint import Finding, lint_file
+from c7n_make.lint_cache import LintCache
+
+
+def test_round_trip_and_misses(tmp_path):
+    cache = LintCache(tmp_path, {"require_comments": True})
+    findings = [Finding("require_description", "Policy a is missing a description.", "a")]
+
+    assert cache.get("policies: []") is None
+    cache.put("policies: []", findings)
+    assert cache.get("policies: []") == findings
+    assert cache.get("policies: [] ") is None
+    assert LintCache(tmp_path, {"require_comments": False}).get("policies: []") is None
+
+
+def test_cached_findings_skip_linting(tmp_path):
+    policy = tmp_path / "policy.yml"
+    policy.write_text("policies: []\n", encoding="utf-8")
+    cache = LintCache(tmp_path / "cache", {})
+    planted = [Finding("planted", "came from the cache")]
+    cache.put(policy.read_text(encoding="utf-8"), planted)
+
+    assert lint_file(policy, {}, cache) == (policy, [Finding("planted", "came from the cache", file=str(policy))])
+    assert lint_file(policy, {})[1][0].rule != "planted"
+
+
+def test_evict_by_age_and_size(tmp_path):
+    cache = LintCache(tmp_path, {})
+    for index in range(4):
+        cache.put(f"doc {index}", [])
+    entries = sorted(tmp_path.glob("*/*.json"))
+    os.utime(entries[0], (0, 0))
+
+    assert cache.evict(max_age_seconds=3600) == 1
+    assert cache.evict(max_size_bytes=0) == 3
+    assert not list(tmp_path.glob("*/*.json"))
@@ -0,0 +1,116 @@
+import io
+
+from c7n_make.lint import (
+    LintContext,
+    build_context,
+    collect_policy_files,
+    lint_cloud_custodian_file,
+    lint_files_in_parallel,
+    lint_stream,
+    run_rules,
+)
+
+GOOD = """---
+# Cloud Custodian version 0.9.41
+policies:
+  - name: tag-queues
+    resource: aws.sqs
+    description: Tag every queue
+    actions:
+      - type: tag
+        key: owner
+        value: unknown
+"""
+
+BUNDLE = """---
+# Cloud Custodian version 0.9.41
+policies:
+  - name: one
+    resource: aws.sqs
+---
+policies:
+  - name: two
+    resource: aws.sqs
+    description: Two
+    actions:
+      - delete
+"""
+
+
+def test_good_file_has_no_findings():
+    assert lint_cloud_custodian_file(GOOD) == []
+
+
+def test_context_is_built_once():
+    context = build_context(BUNDLE)
+    assert len(context.documents) == 2
+    assert context.first_line == "---"
+    assert context.comments == [(1, "# Cloud Custodian version 0.9.41")]
+
+
+def test_document_and_file_rules():
+    findings = run_rules(build_context(BUNDLE.lstrip("-\n")), {})
+    rules = sorted(finding.rule for finding in findings)
+    # File rules report once, no matter how many documents there are.
+    assert rules == ["allowed_actions", "require_description", "require_document_separator"]
+
+
+def test_disabled_rules_are_skipped():
+    findings = run_rules(build_context(BUNDLE), {"require_description": False, "allowed_actions": False})
+    assert findings == []
+
+
+def test_directory_mode(tmp_path):
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "good.yml").write_text(GOOD, encoding="utf-8")
+    (tmp_path / "nested" / "bundle.yaml").write_text(BUNDLE, encoding="utf-8")
+    (tmp_path / "broken.yml").write_text("policies: [", encoding="utf-8")
+
+    files = collect_policy_files([str(tmp_path)])
+    assert [file.name for file in files] == ["broken.yml", "good.yml", "bundle.yaml"]
+
+    results = lint_files_in_parallel(files, {}, processes=2)
+    assert list(results.files) == [str(file) for file in files]
+    broken, good, bundle = results.files.values()
+    assert [(finding.rule, finding.severity) for finding in broken] == [("yaml_syntax", "error")]
+    assert broken[0].line is not None
+    assert good == []
+    assert {finding.file for finding in bundle} == {str(files[2])}
+    assert len(results) == 3
+    assert results.exit_code() == 1
+    assert results.exit_code("error") == 1
+
+
+def test_glob_sources(tmp_path):
+    (tmp_path / "good.yml").write_text(GOOD, encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("not yaml", encoding="utf-8")
+    assert collect_policy_files([str(tmp_path / "*.yml")]) == [tmp_path / "good.yml"]
+
+
+def test_stream_matches_whole_file():
+    for text in (GOOD, BUNDLE, BUNDLE.lstrip("-\n"), "policies: [", "# comment only\n"):
+        streamed = lint_stream(io.StringIO(text), {})
+        whole = run_rules(build_context(text), {})
+        # Syntax error messages quote the stream name, so compare everything else.
+        assert [(f.rule, f.policy, f.line, f.column) for f in streamed] == [
+            (f.rule, f.policy, f.line, f.column) for f in whole]
+
+
+def test_feed_handles_lines_split_across_chunks():
+    context = LintContext(text="")
+    for chunk in ("  \n# Cloud Cus", "todian version 1\n---", "\npolicies: []"):
+        context.feed(chunk)
+    context.finish()
+    assert context.first_line == "# Cloud Custodian version 1"
+    assert context.first_line_number == 1
+    assert context.comments == [(1, "# Cloud Custodian version 1")]
+
+
+def test_findings_are_located():
+    findings = run_rules(build_context(BUNDLE), {})
+    assert [(f.rule, f.policy, f.line, f.column) for f in findings] == [
+        ("require_description", "one", 4, 5),
+        ("allowed_actions", "two", 12, 9),
+    ]
+    streamed = lint_stream(io.StringIO(BUNDLE), {})
+    assert [(f.line, f.column) for f in streamed] == [(4, 5), (12, 9)]
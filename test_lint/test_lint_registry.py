@@ -0,0 +1,40 @@
+import sys
+from importlib.metadata import EntryPoint
+
+from c7n_make import lint_registry
+from c7n_make.lint import lint_cloud_custodian_file
+
+TEXT_ONLY = {"require_description": False, "allowed_actions": False}
+
+PLUGIN = '''
+from c7n_make.findings import Finding
+from c7n_make.lint_registry import DOCUMENT, rule
+
+
+@rule("require_owner", needs=(DOCUMENT,))
+def require_owner(context, content, config):
+    for policy in content.get("policies", []):
+        if "owner" not in policy:
+            yield Finding("require_owner", "no owner", policy.get("name"))
+'''
+
+
+def test_text_only_rules_skip_parsing():
+    rules = lint_registry.enabled_rules(TEXT_ONLY)
+    assert not lint_registry.needs_documents(rules)
+    findings = lint_cloud_custodian_file("---\n# Cloud Custodian version 1\npolicies: [", config=TEXT_ONLY)
+    assert findings == []
+
+
+def test_plugin_rules_are_opt_in(tmp_path, monkeypatch):
+    (tmp_path / "acme_lint_rules.py").write_text(PLUGIN, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    entry_point = EntryPoint("require_owner", "acme_lint_rules", lint_registry.ENTRY_POINT_GROUP)
+    monkeypatch.setattr(lint_registry, "_plugin_entry_points", lambda: {"require_owner": entry_point})
+
+    assert "require_owner" not in {rule.name for rule in lint_registry.enabled_rules({})}
+    assert "acme_lint_rules" not in sys.modules
+
+    config = dict(TEXT_ONLY, require_owner=True)
+    findings = lint_cloud_custodian_file("policies:\n  - name: a\n", config=config)
+    assert "require_owner" in [finding.rule for finding in findings]
@@ -0,0 +1,49 @@
+import io
+import json
+import xml.etree.ElementTree as ET
+
+from c7n_make.findings import Finding, LintResults
+from c7n_make.lint_report import WRITERS
+
+
+def _results() -> LintResults:
+    results = LintResults()
+    results.add("policies/a.yml", [
+        Finding("require_description", "Policy a is missing a description.", "a", "policies/a.yml", 3, 5),
+        Finding("yaml_syntax", "Error parsing YAML", file="policies/a.yml", severity="error"),
+    ])
+    results.add("policies/b.yml", [])
+    return results
+
+
+def _render(name: str) -> str:
+    out = io.StringIO()
+    WRITERS[name](_results(), out)
+    return out.getvalue()
+
+
+def test_exit_code():
+    assert _results().exit_code() == 1
+    assert LintResults({"ok.yml": [Finding("x", "y", severity="info")]}).exit_code() == 0
+
+
+def test_text():
+    assert "policies/a.yml:3:5: warning [require_description]" in _render("text")
+
+
+def test_json():
+    report = json.loads(_render("json"))
+    assert report["files"] == 2
+    assert [finding["rule"] for finding in report["findings"]] == ["yaml_syntax", "require_description"]
+
+
+def test_sarif():
+    results = json.loads(_render("sarif"))["runs"][0]["results"]
+    assert results[0]["locations"][0]["physicalLocation"]["region"] == {"startLine": 3, "startColumn": 5}
+    assert results[1]["level"] == "error"
+
+
+def test_junit():
+    suite = ET.fromstring(_render("junit"))
+    assert suite.get("tests") == "2"
+    assert suite.get("failures") == "1"
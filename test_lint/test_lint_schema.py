@@ -0,0 +1,62 @@
+from c7n_make.lint import lint_cloud_custodian_file
+
+POLICIES = """---
+# Cloud Custodian version 0.9.41
+policies:
+  - name: tag-queues
+    resource: aws.sqs
+    description: Tag every queue
+    actions:
+      - type: tag
+        bogus: 1
+  - name: extras-queues
+    resource: awsx.sqs
+    description: The awsx provider is part of the schema
+"""
+
+
+def test_schema_errors_are_located(tmp_path, monkeypatch):
+    from c7n_make import schema
+
+    config = {"schema": True, "schema_cache_dir": str(tmp_path)}
+    findings = lint_cloud_custodian_file(POLICIES, config=config)
+    assert [(f.rule, f.policy, f.line, f.severity) for f in findings] == [("schema", "tag-queues", 8, "error")]
+    assert list(tmp_path.glob("c7n-*.json"))
+
+    # The second run, in a fresh process as far as the schema is concerned, reads the schema
+    # saved by the first rather than generating it again.
+    def generate(*args, **kwargs):
+        raise AssertionError("The schema was generated again")
+
+    monkeypatch.setattr("c7n.schema.generate", generate)
+    schema.validators.cache_clear()
+    try:
+        assert lint_cloud_custodian_file(POLICIES, config=config) == findings
+    finally:
+        schema.validators.cache_clear()
+
+
+def test_schema_rule_is_opt_in():
+    assert all(finding.rule != "schema" for finding in lint_cloud_custodian_file(POLICIES, config={}))
+
+
+def test_schema_key_tracks_providers(monkeypatch):
+    from c7n_make import schema
+
+    key = schema.schema_key()
+    monkeypatch.setattr(schema, "provider_versions", lambda: {"c7n": "0.0.0", "c7n_azure": "1.0.0"})
+    assert schema.schema_key() != key
+
+
+def test_schema_cache_survives_eviction(tmp_path):
+    from c7n_make.lint_cache import LintCache
+    from c7n_make.schema import DEFAULT_SCHEMA_DIR
+
+    cache_dir = tmp_path / ".c7n_lint_cache"
+    schema_file = tmp_path / DEFAULT_SCHEMA_DIR / "c7n-test.json"
+    schema_file.parent.mkdir(parents=True)
+    schema_file.write_text("{}", encoding="utf-8")
+    cache = LintCache(cache_dir, {})
+    cache.put("policies: []", [])
+    assert cache.evict(max_age_seconds=-1) == 1
+    assert schema_file.exists()
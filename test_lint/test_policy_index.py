@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from c7n_make.policy_index import PolicyIndex
+
+
+def _policy(*names: str) -> str:
+    return "policies:\n" + "".join(f"  - name: {name}\n    resource: aws.sqs\n" for name in names)
+
+
+def test_duplicates_and_mismatches(tmp_path):
+    (tmp_path / "tag-queues.yml").write_text(_policy("tag-queues"), encoding="utf-8")
+    (tmp_path / "copy.yml").write_text(_policy("tag-queues"), encoding="utf-8")
+    (tmp_path / "bundle.yml").write_text(_policy("a", "b", "a"), encoding="utf-8")
+    index = PolicyIndex()
+    assert index.refresh(sorted(tmp_path.glob("*.yml"))) == 3
+
+    assert index.duplicates() == {
+        "tag-queues": [str(tmp_path / "copy.yml"), str(tmp_path / "tag-queues.yml")],
+        "a": [str(tmp_path / "bundle.yml")],
+    }
+    assert index.mismatches() == {str(tmp_path / "copy.yml"): "tag-queues"}
+
+    findings = index.findings({})
+    assert sorted(f.rule for f in findings[str(tmp_path / "copy.yml")]) == [
+        "policy_name_matches_file", "unique_policy_names"]
+    assert index.findings({"unique_policy_names": False, "policy_name_matches_file": False}) == {}
+
+
+def test_incremental_refresh(tmp_path):
+    first, second = tmp_path / "one.yml", tmp_path / "two.yml"
+    first.write_text(_policy("one"), encoding="utf-8")
+    second.write_text(_policy("one"), encoding="utf-8")
+    index = PolicyIndex()
+    index.refresh([first, second])
+    index.save(tmp_path / "index.json")
+
+    index = PolicyIndex.load(tmp_path / "index.json")
+    second.write_text(_policy("two"), encoding="utf-8")
+    assert index.refresh([first, second]) == 1
+    assert index.duplicates() == {}
+
+    # Files left out of a run are still known, unless they were deleted.
+    assert index.refresh([first]) == 0
+    assert set(index.names) == {"one", "two"}
+    second.unlink()
+    assert index.refresh([first]) == 0
+    assert set(index.names) == {"one"}
+
+
+def test_names_collected_while_streaming(tmp_path):
+    from c7n_make.lint import lint_files_in_parallel
+
+    first, second = tmp_path / "one.yml", tmp_path / "two.yml"
+    first.write_text(_policy("one", "shared"), encoding="utf-8")
+    second.write_text(_policy("shared"), encoding="utf-8")
+    index = PolicyIndex()
+    lint_files_in_parallel([first, second], {}, processes=1, stream=True, index=index)
+    assert index.duplicates() == {"shared": [str(first), str(second)]}
+
+
+def test_same_file_by_different_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "one.yml").write_text(_policy("one"), encoding="utf-8")
+    index = PolicyIndex()
+    index.refresh([Path("one.yml")])
+    index.refresh([tmp_path / "one.yml"])
+    assert list(index.files) == [str((tmp_path / "one.yml").resolve())]
+    assert index.duplicates() == {}
+
+
+def test_files_outside_the_run_are_rechecked(tmp_path):
+    first, second = tmp_path / "one.yml", tmp_path / "two.yml"
+    first.write_text(_policy("one"), encoding="utf-8")
+    second.write_text(_policy("one"), encoding="utf-8")
+    index = PolicyIndex()
+    index.refresh([first, second])
+    assert index.duplicates()
+
+    second.write_text(_policy("two", "three"), encoding="utf-8")
+    assert index.refresh([first]) == 1
+    assert index.duplicates() == {}
+    assert set(index.names) == {"one", "two", "three"}